@@ -0,0 +1,326 @@
+# admission.py
+"""Priority admission control for the /api/* fetch endpoints.
+
+Every scheduled endpoint belongs to a priority class, highest first:
+
+    clinical    GP/Cardio/Ortho single-patient lookups
+    frontdesk   front desk single-patient lookups
+    bulk        batch fetches and billing scans
+
+A request runs once there is a free slot in the process (ADMISSION_CAPACITY),
+in its class (ADMISSION_<CLASS>_LIMIT) and, where one is set, in its own
+endpoint (ADMISSION_ENDPOINT_LIMITS); otherwise it waits in its class's
+bounded queue. A freed slot goes to the highest-priority waiter that can
+use it, FIFO within a class, so billing refreshes cannot take the slots
+clinical lookups need.
+
+A request is shed with Rejected, which the apps turn into a 503 with
+Retry-After, when its queue is full, when the expected wait already exceeds
+the class deadline, or when it has waited that long without a slot.
+"""
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+import metrics
+
+CAPACITY = int(os.environ.get("ADMISSION_CAPACITY", "32"))
+
+# name -> (concurrency limit, queue size, deadline seconds), highest priority first
+CLASS_DEFAULTS = {
+    "clinical": (32, 128, 2.0),
+    "frontdesk": (16, 64, 5.0),
+    "bulk": (4, 8, 30.0),
+}
+
+# Whole-container scans get one slot each on top of the bulk class limit
+ENDPOINT_LIMITS = os.environ.get(
+    "ADMISSION_ENDPOINT_LIMITS",
+    "fetch_billingdesk_data=1,fetch_billingdesk_summary=1,fetch_billingdesk_stream=1",
+)
+
+WAIT_SAMPLES = 1024
+SERVICE_TIME_ALPHA = 0.2
+
+WAIT_SECONDS = metrics.REGISTRY.register(metrics.Histogram(
+    "ehr_admission_wait_seconds", "Time requests queued before admission.", labels=("priority",)))
+
+# Ticket held by the current request, so the sync path does not queue it twice
+_held = contextvars.ContextVar("admission_ticket", default=None)
+
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Class:
+    def __init__(self, name, rank, limit, queue_size, deadline):
+        self.name = name
+        self.rank = rank
+        self.limit = limit
+        self.queue_size = queue_size
+        self.deadline = deadline
+        self.active = 0
+        self.queue = deque()
+        self.service_time = None   # EWMA of seconds a request holds its slot
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.stats = {"admitted": 0, "shed_queue_full": 0, "shed_deadline": 0, "max_queued": 0}
+
+    def expected_wait(self, position):
+        """Rough time until the ``position``-th waiter gets a slot."""
+        if self.service_time is None:
+            return 0.0
+        return math.ceil(position / max(1, self.limit)) * self.service_time
+
+    def retry_after(self):
+        return max(1, math.ceil(self.expected_wait(len(self.queue) + 1) or self.deadline))
+
+
+class _Ticket:
+    def __init__(self, endpoint, klass):
+        self.endpoint = endpoint
+        self.klass = klass
+        self.started = time.monotonic()
+        self.released = False
+
+
+class _Waiter:
+    def __init__(self, endpoint, wake):
+        self.endpoint = endpoint
+        self.wake = wake
+        self.enqueued = time.monotonic()
+        self.ticket = None
+
+
+class Scheduler:
+    def __init__(self, capacity=CAPACITY, classes=None, endpoint_limits=None):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._classes = {
+            name: _Class(name, rank, *config)
+            for rank, (name, config) in enumerate((classes or CLASS_DEFAULTS).items())
+        }
+        self._endpoints = {}   # endpoint -> class name
+        self._endpoint_limits = dict(endpoint_limits or {})
+        self._endpoint_active = {}
+        self._active = 0
+
+    @classmethod
+    def from_env(cls):
+        classes = {}
+        for name, (limit, queue_size, deadline) in CLASS_DEFAULTS.items():
+            prefix = f"ADMISSION_{name.upper()}_"
+            classes[name] = (
+                int(os.environ.get(prefix + "LIMIT", str(limit))),
+                int(os.environ.get(prefix + "QUEUE", str(queue_size))),
+                float(os.environ.get(prefix + "DEADLINE", str(deadline))),
+            )
+        endpoint_limits = {}
+        for item in ENDPOINT_LIMITS.split(","):
+            if item.strip():
+                endpoint, limit = item.split("=")
+                endpoint_limits[endpoint.strip()] = int(limit)
+        return cls(CAPACITY, classes, endpoint_limits)
+
+    def register(self, endpoint, priority):
+        if priority not in self._classes:
+            raise ValueError(f"Unknown priority class: {priority}")
+        self._endpoints[endpoint] = priority
+
+    # -----------------------------
+    # Slots
+    # -----------------------------
+    def _can_run(self, klass, endpoint):
+        # Caller holds the lock
+        limit = self._endpoint_limits.get(endpoint)
+        return (self._active < self.capacity and klass.active < klass.limit
+                and (limit is None or self._endpoint_active.get(endpoint, 0) < limit))
+
+    def _start(self, klass, endpoint, waited):
+        # Caller holds the lock
+        self._active += 1
+        klass.active += 1
+        self._endpoint_active[endpoint] = self._endpoint_active.get(endpoint, 0) + 1
+        klass.stats["admitted"] += 1
+        klass.waits.append(waited)
+        WAIT_SECONDS.observe(waited, priority=klass.name)
+        return _Ticket(endpoint, klass)
+
+    def _enter(self, endpoint, wake):
+        """``(ticket, None)`` if admitted now, else ``(None, waiter)``; raises Rejected."""
+        klass = self._classes[self._endpoints[endpoint]]
+        with self._lock:
+            # Every release re-dispatches, so any queued waiter is blocked by a
+            # limit this request shares unless it is for another endpoint
+            if self._can_run(klass, endpoint):
+                return self._start(klass, endpoint, 0.0), None
+            if len(klass.queue) >= klass.queue_size:
+                klass.stats["shed_queue_full"] += 1
+                raise Rejected("queue full", klass.retry_after())
+            if klass.expected_wait(len(klass.queue) + 1) > klass.deadline:
+                klass.stats["shed_deadline"] += 1
+                raise Rejected("deadline", klass.retry_after())
+            waiter = _Waiter(endpoint, wake)
+            klass.queue.append(waiter)
+            klass.stats["max_queued"] = max(klass.stats["max_queued"], len(klass.queue))
+            return None, waiter
+
+    def _settle(self, waiter, shed=True):
+        """The waiter's ticket if it was admitted meanwhile; otherwise dequeue it."""
+        klass = self._classes[self._endpoints[waiter.endpoint]]
+        with self._lock:
+            if waiter.ticket is not None:
+                return waiter.ticket
+            klass.queue.remove(waiter)
+            if shed:
+                klass.stats["shed_deadline"] += 1
+                raise Rejected("deadline", klass.retry_after())
+            return None
+
+    def _dispatch(self):
+        # Caller holds the lock
+        for klass in self._classes.values():
+            for waiter in list(klass.queue):
+                if self._active >= self.capacity:
+                    return
+                if self._can_run(klass, waiter.endpoint):
+                    klass.queue.remove(waiter)
+                    waiter.ticket = self._start(klass, waiter.endpoint, time.monotonic() - waiter.enqueued)
+                    waiter.wake()
+
+    def acquire(self, endpoint):
+        """Block until ``endpoint`` may run; returns a ticket for release().
+
+        Returns None if the current request was already admitted (by
+        acquire_async) for this endpoint.
+        """
+        held = _held.get()
+        if held is not None and held.endpoint == endpoint:
+            return None
+        event = threading.Event()
+        ticket, waiter = self._enter(endpoint, event.set)
+        if ticket is None:
+            event.wait(self._classes[self._endpoints[endpoint]].deadline)
+            ticket = self._settle(waiter)
+        return ticket
+
+    async def acquire_async(self, endpoint):
+        """acquire() for the event loop: waits without holding a thread."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        ticket, waiter = self._enter(endpoint, wake)
+        if ticket is not None:
+            return ticket
+        try:
+            await asyncio.wait([future], timeout=self._classes[self._endpoints[endpoint]].deadline)
+        except BaseException:
+            # Cancelled (client went away): give back a slot granted meanwhile
+            self.release(self._settle(waiter, shed=False))
+            raise
+        return self._settle(waiter)
+
+    def release(self, ticket):
+        if ticket is None or ticket.released:
+            return
+        klass = ticket.klass
+        held_for = time.monotonic() - ticket.started
+        with self._lock:
+            ticket.released = True
+            self._active -= 1
+            klass.active -= 1
+            self._endpoint_active[ticket.endpoint] -= 1
+            if klass.service_time is None:
+                klass.service_time = held_for
+            else:
+                klass.service_time += SERVICE_TIME_ALPHA * (held_for - klass.service_time)
+            self._dispatch()
+
+    @contextmanager
+    def holding(self, ticket):
+        """Mark ``ticket`` as the current request's, so acquire() for its
+        endpoint (in this context or a copy of it) does not queue again."""
+        token = _held.set(ticket)
+        try:
+            yield
+        finally:
+            _held.reset(token)
+
+    @asynccontextmanager
+    async def admitted(self, endpoint):
+        """Hold a slot for ``endpoint`` while the body runs (ASGI routes)."""
+        ticket = await self.acquire_async(endpoint)
+        try:
+            with self.holding(ticket):
+                yield
+        finally:
+            self.release(ticket)
+
+    def is_scheduled(self, endpoint):
+        return endpoint in self._endpoints
+
+    def stats(self):
+        with self._lock:
+            classes = {}
+            for klass in self._classes.values():
+                waits = sorted(klass.waits)
+                classes[klass.name] = dict(
+                    klass.stats,
+                    active=klass.active,
+                    queued=len(klass.queue),
+                    limit=klass.limit,
+                    queue_size=klass.queue_size,
+                    deadline_s=klass.deadline,
+                    wait_p50_ms=round(1000 * waits[len(waits) // 2], 2) if waits else 0.0,
+                    wait_p99_ms=round(1000 * waits[min(len(waits) - 1, int(0.99 * len(waits)))], 2) if waits else 0.0,
+                    service_time_ms=round(1000 * klass.service_time, 2) if klass.service_time is not None else None,
+                )
+            endpoints = {
+                endpoint: {
+                    "priority": priority,
+                    "active": self._endpoint_active.get(endpoint, 0),
+                    "limit": self._endpoint_limits.get(endpoint),
+                }
+                for endpoint, priority in self._endpoints.items()
+            }
+            return {"capacity": self.capacity, "active": self._active, "classes": classes, "endpoints": endpoints}
+
+
+class ReleasingIterator:
+    """Iterates a streamed response and releases its ticket when it is done,
+    closed or dropped, so the slot covers the whole stream."""
+
+    def __init__(self, items, scheduler, ticket):
+        self._items = iter(items)
+        self._scheduler = scheduler
+        self._ticket = ticket
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._items)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        close = getattr(self._items, "close", None)
+        if close is not None:
+            close()
+        self._scheduler.release(self._ticket)
+
+    def __del__(self):
+        self._scheduler.release(self._ticket)
@@ -0,0 +1,171 @@
+# aes_engine.py
+"""In-process AES-256-GCM, byte-compatible with aes_gcm.exe.
+
+File format (see aes_gcm.c):
+
+    salt (16) | iv (12) | ciphertext | tag (16)
+
+The key is PBKDF2-HMAC-SHA256(password, salt, 100000 iterations, 32 bytes).
+Every record has its own salt, so a key can only be reused for the same
+record; key_cache() lets a caller (a login session) keep derived keys so
+decrypting a record again costs only the AES-GCM pass.
+"""
+import contextvars
+import hashlib
+import hmac
+import os
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+KEY_SIZE = 32
+IV_SIZE = 12
+SALT_SIZE = 16
+TAG_SIZE = 16
+PBKDF2_ITERS = 100000
+
+HEADER_SIZE = SALT_SIZE + IV_SIZE
+
+
+class DecryptionError(Exception):
+    pass
+
+
+class KeyCache:
+    """Bounded LRU of keys derived from one password, by salt."""
+
+    def __init__(self, password, max_entries=4096):
+        self._password = password.encode() if isinstance(password, str) else password
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._keys = OrderedDict()
+
+    def matches(self, password):
+        if isinstance(password, str):
+            password = password.encode()
+        return hmac.compare_digest(password, self._password)
+
+    def key(self, salt):
+        salt = bytes(salt)
+        with self._lock:
+            key = self._keys.get(salt)
+            if key is not None:
+                self._keys.move_to_end(salt)
+                return key
+        key = _pbkdf2(self._password, salt)
+        with self._lock:
+            self._keys[salt] = key
+            while len(self._keys) > self.max_entries:
+                self._keys.popitem(last=False)
+        return key
+
+    def __len__(self):
+        with self._lock:
+            return len(self._keys)
+
+
+_key_cache = contextvars.ContextVar("aes_key_cache", default=None)
+
+
+@contextmanager
+def key_cache(cache):
+    """Use ``cache`` for derive_key() calls in this context (and copies of it)."""
+    token = _key_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _key_cache.reset(token)
+
+
+def _pbkdf2(password, salt):
+    return hashlib.pbkdf2_hmac("sha256", password, salt, PBKDF2_ITERS, KEY_SIZE)
+
+
+def derive_key(password, salt):
+    if isinstance(password, str):
+        password = password.encode()
+    cache = _key_cache.get()
+    if cache is not None and cache.matches(password):
+        return cache.key(salt)
+    return _pbkdf2(password, salt)
+
+
+def split_header(data):
+    if len(data) < HEADER_SIZE + TAG_SIZE:
+        raise DecryptionError("Encrypted record is truncated")
+    return bytes(data[:SALT_SIZE]), bytes(data[SALT_SIZE:HEADER_SIZE])
+
+
+def decrypt_bytes(password, data):
+    """Decrypt a salt|iv|ciphertext|tag record and return the plaintext."""
+    salt, iv = split_header(data)
+    key = derive_key(password, salt)
+    try:
+        # AESGCM expects ciphertext||tag, which is exactly the record body;
+        # a memoryview slice avoids copying it (e.g. out of a mirror mmap).
+        return AESGCM(key).decrypt(iv, memoryview(data)[HEADER_SIZE:], None)
+    except InvalidTag:
+        raise DecryptionError("Decryption failed") from None
+
+
+class StreamDecryptor:
+    """Incremental decrypt of one record, given its header and trailing tag.
+
+    update() returns plaintext that is NOT yet authenticated; it may only be
+    released once finalize() has returned without raising DecryptionError.
+    """
+
+    def __init__(self, password, header, tag):
+        if len(header) != HEADER_SIZE or len(tag) != TAG_SIZE:
+            raise DecryptionError("Encrypted record is truncated")
+        salt, iv = bytes(header[:SALT_SIZE]), bytes(header[SALT_SIZE:])
+        key = derive_key(password, salt)
+        self._decryptor = Cipher(algorithms.AES(key), modes.GCM(iv, bytes(tag))).decryptor()
+
+    def update(self, chunk):
+        return self._decryptor.update(chunk)
+
+    def finalize(self):
+        try:
+            return self._decryptor.finalize()
+        except InvalidTag:
+            raise DecryptionError("Decryption failed") from None
+
+
+def encrypt_bytes(password, plaintext):
+    salt = os.urandom(SALT_SIZE)
+    iv = os.urandom(IV_SIZE)
+    key = derive_key(password, salt)
+    return salt + iv + AESGCM(key).encrypt(iv, plaintext, None)
+
+
+# -----------------------------
+# Same CLI as aes_gcm.exe, for checking compatibility by hand
+# -----------------------------
+def main(argv):
+    if len(argv) != 5 or argv[1] not in ("encrypt", "decrypt"):
+        print(f"Usage: {argv[0]} encrypt|decrypt <password> <infile> <outfile>", file=sys.stderr)
+        return 1
+
+    mode, password, infile, outfile = argv[1:]
+    with open(infile, "rb") as f:
+        data = f.read()
+
+    try:
+        result = encrypt_bytes(password, data) if mode == "encrypt" else decrypt_bytes(password, data)
+    except DecryptionError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    with open(outfile, "wb") as f:
+        f.write(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
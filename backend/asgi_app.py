@@ -0,0 +1,218 @@
+# asgi_app.py
+"""ASGI version of the backend: same /api/* routes and JSON as server.py.
+
+Run with ``python asgi_app.py`` (ASGI_WORKERS processes, default 1) or
+``uvicorn asgi_app:app --workers N``; multiple workers need
+CHALLENGE_STORE=sqlite so a login can be verified by any of them, and
+SESSION_STORE=sqlite with SESSION_SECRET so any of them can resolve the
+session it issued.
+
+The event loop only parses requests and writes responses; the blocking
+Azure I/O and decryption in handlers.py run on a bounded worker-thread pool
+(ASGI_BLOCKING_THREADS), so one process serves many concurrent dashboard
+requests. Fetch endpoints first wait for an admission slot (admission.py)
+on the event loop, so queued requests do not hold those threads.
+"""
+import os
+from contextlib import asynccontextmanager
+
+import uvicorn
+from anyio import to_thread
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+
+import admission
+import challenge_store
+import handlers
+import metrics
+import sessions
+
+BLOCKING_THREADS = int(os.environ.get("ASGI_BLOCKING_THREADS", "64"))
+ASGI_WORKERS = int(os.environ.get("ASGI_WORKERS", "1"))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    to_thread.current_default_thread_limiter().total_tokens = BLOCKING_THREADS
+    await to_thread.run_sync(handlers.startup)
+    yield
+
+
+class MetricsMiddleware:
+    """Opens a metrics request scope around each HTTP request.
+
+    Worker threads started with to_thread inherit the scope, so the stage
+    spans recorded in handlers.py are attributed to the request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        if self._paths is None:
+            self._paths = {route.path for route in app.routes}
+        token = metrics.start_request(scope["path"] if scope["path"] in self._paths else "other")
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.finish_request(token, status[0])
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(
+    CORSMiddleware,  # allow requests from frontend
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["X-Failed-Records"],
+)
+
+
+async def respond(handler, *args):
+    endpoint = getattr(handler, "admission_endpoint", None)
+    if endpoint is None:
+        payload, status, headers = await to_thread.run_sync(handler, *args)
+        return JSONResponse(payload, status_code=status, headers=headers)
+
+    # Queue on the event loop rather than in a worker thread, so waiting
+    # requests do not use up ASGI_BLOCKING_THREADS
+    try:
+        async with handlers.ADMISSION.admitted(endpoint):
+            payload, status, headers = await to_thread.run_sync(handler, *args)
+    except admission.Rejected as e:
+        payload, status, headers = handlers.busy_response(e)
+    return JSONResponse(payload, status_code=status, headers=headers)
+
+
+@app.get("/api/get_system_id")
+async def api_get_system_id():
+    return await respond(handlers.api_get_system_id)
+
+
+@app.post("/api/get_challenge")
+async def get_challenge(request: Request):
+    return await respond(handlers.api_get_challenge, await request.json())
+
+
+@app.post("/api/verify_login")
+async def verify_login(request: Request):
+    return await respond(handlers.api_verify_login, await request.json())
+
+
+@app.post("/api/logout")
+async def logout(request: Request):
+    return await respond(handlers.api_logout, await request.json())
+
+
+@app.post("/api/fetch_gp_data")
+async def fetch_gp_data(request: Request):
+    return await respond(handlers.api_fetch_clinical_data, await request.json())
+
+
+@app.post("/api/fetch_cardio_data")
+async def fetch_cardio_data(request: Request):
+    return await respond(handlers.api_fetch_clinical_data, await request.json())
+
+
+@app.post("/api/fetch_ortho_data")
+async def fetch_ortho_data(request: Request):
+    return await respond(handlers.api_fetch_clinical_data, await request.json())
+
+
+@app.post("/api/fetch_frontdesk_data")
+async def fetch_frontdesk_data(request: Request):
+    return await respond(handlers.api_fetch_frontdesk_data, await request.json())
+
+
+@app.post("/api/fetch_batch_data")
+async def fetch_batch_data(request: Request):
+    return await respond(handlers.api_fetch_batch_data, await request.json())
+
+
+@app.post("/api/fetch_billingdesk_data")
+async def fetch_billingdesk_data(request: Request):
+    return await respond(handlers.api_fetch_billingdesk_data, await request.json())
+
+
+@app.post("/api/fetch_billingdesk_summary")
+async def fetch_billingdesk_summary(request: Request):
+    return await respond(handlers.api_fetch_billingdesk_summary, await request.json())
+
+
+@app.post("/api/fetch_billingdesk_stream")
+async def fetch_billingdesk_stream(request: Request):
+    handler = handlers.api_fetch_billingdesk_stream
+    data = await request.json()
+    # Admitted on the event loop like respond(), but the slot is kept until
+    # the stream has been sent, not just until the handler returns
+    try:
+        ticket = await handlers.ADMISSION.acquire_async(handler.admission_endpoint)
+    except admission.Rejected as e:
+        payload, status, headers = handlers.busy_response(e)
+        return JSONResponse(payload, status_code=status, headers=headers)
+    try:
+        with handlers.ADMISSION.holding(ticket):
+            payload, status, headers = await to_thread.run_sync(handler, data)
+    except BaseException:
+        handlers.ADMISSION.release(ticket)
+        raise
+    if status != 200:
+        handlers.ADMISSION.release(ticket)
+        return JSONResponse(payload, status_code=status, headers=headers)
+    media_type = headers.pop("Content-Type", "application/x-ndjson")
+    stream = admission.ReleasingIterator(payload, handlers.ADMISSION, ticket)
+    return StreamingResponse(iterate_in_threadpool(stream), media_type=media_type, headers=headers)
+
+
+@app.post("/api/fetch_billingdesk_page")
+async def fetch_billingdesk_page(request: Request):
+    return await respond(handlers.api_fetch_billingdesk_page, await request.json())
+
+
+@app.get("/api/cache_stats")
+async def cache_stats():
+    return await respond(handlers.api_cache_stats)
+
+
+@app.post("/api/admin/prefetch")
+async def prefetch_schedule(request: Request):
+    return await respond(handlers.api_prefetch_schedule, await request.json())
+
+
+@app.get("/api/admin/prefetch")
+async def prefetch_coverage():
+    return await respond(handlers.api_prefetch_coverage)
+
+
+@app.get("/api/admin/admission")
+async def admission_stats():
+    return await respond(handlers.api_admission_stats)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    payload, status, headers = handlers.api_metrics()
+    return PlainTextResponse(payload, status_code=status, headers=headers)
+
+
+if __name__ == "__main__":
+    if ASGI_WORKERS > 1 and isinstance(handlers.CHALLENGES, challenge_store.MemoryChallengeStore):
+        print("Warning: login challenges are per-process; set CHALLENGE_STORE=sqlite for multiple workers")
+    if ASGI_WORKERS > 1 and isinstance(handlers.SESSIONS, sessions.MemorySessionStore):
+        print("Warning: login sessions are per-process; set SESSION_STORE=sqlite and SESSION_SECRET for multiple workers")
+    uvicorn.run("asgi_app:app", host="127.0.0.1", port=8000, workers=ASGI_WORKERS)
@@ -0,0 +1,135 @@
+# bench_mirror.py
+"""Benchmark: live blob downloads vs reads served by the local mirror.
+
+A fake container (fakes.FakeContainerClient, with per-request latency and
+bandwidth) is filled with real AES-GCM records and mirrored into a temporary
+directory with blob_mirror.sync(). Each mode then reads every blob --repeat
+times through the same container-client interface the handlers use:
+
+    live     download_blob().readall() against the fake container
+    mirror   the same call through MirroredContainerClient (mmap hit)
+
+and reports p50/p99 latency, plus the bytes allocated per read (tracemalloc)
+for the download alone and for download + decrypt. Keys are pre-derived with
+aes_engine.key_cache so PBKDF2 does not drown out the I/O difference.
+
+Example:
+    python benchmarks/bench_mirror.py --blobs 200 --size-kb 64 \\
+        --download-latency-ms 8 --bandwidth-mbps 400
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import aes_engine  # noqa: E402
+import blob_mirror  # noqa: E402
+import fakes  # noqa: E402
+
+PASSWORD = "GP_Doctor#Secure1"
+CONTAINER = "layer-b"
+MODES = ["live", "mirror"]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(container_client, names, repeat, decrypt):
+    latencies = []
+    for _ in range(repeat):
+        for name in names:
+            started = time.perf_counter()
+            data = container_client.download_blob(name).readall()
+            if decrypt:
+                aes_engine.decrypt_bytes(PASSWORD, data)
+            latencies.append(time.perf_counter() - started)
+            del data
+    return latencies
+
+
+def allocated_per_read(container_client, names, decrypt):
+    """Mean bytes allocated and still referenced at the end of one read."""
+    tracemalloc.start()
+    try:
+        total = 0
+        for name in names:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            data = container_client.download_blob(name).readall()
+            if decrypt:
+                aes_engine.decrypt_bytes(PASSWORD, data)
+            total += tracemalloc.get_traced_memory()[1] - before
+            del data
+        return total / len(names)
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live downloads vs local mirror reads.")
+    parser.add_argument("--blobs", type=int, default=200)
+    parser.add_argument("--size-kb", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--download-latency-ms", type=float, default=8, help="per request")
+    parser.add_argument("--bandwidth-mbps", type=float, default=400, help="per request; 0 = unlimited")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    live = fakes.FakeContainerClient(
+        CONTAINER, download_latency_ms=args.download_latency_ms, bandwidth_mbps=args.bandwidth_mbps)
+    names = [f"patient_{100000 + i}.enc" for i in range(args.blobs)]
+    keys = aes_engine.KeyCache(PASSWORD, max_entries=args.blobs)
+    for name in names:
+        live.upload_blob(name, aes_engine.encrypt_bytes(PASSWORD, os.urandom(args.size_kb * 1024)))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as root, aes_engine.key_cache(keys):
+        mirror = blob_mirror.BlobMirror(root)
+        started = time.perf_counter()
+        counts = mirror.sync(CONTAINER, live)
+        print(f"Initial sync: {counts['downloaded']} blobs in {time.perf_counter() - started:.2f}s")
+        started = time.perf_counter()
+        counts = mirror.sync(CONTAINER, live)
+        print(f"Re-sync: {counts['unchanged']} unchanged in {time.perf_counter() - started:.2f}s")
+
+        etags = {blob.name: blob.etag for blob in live.list_blobs()}   # what the blob index would hold
+        clients = {"live": live, "mirror": mirror.client(CONTAINER, live, etags.get)}
+        for name in names:   # derive every key once, outside the timings
+            aes_engine.decrypt_bytes(PASSWORD, live.download_blob(name).readall())
+
+        header = f"{'mode':<8} {'decrypt':<8} {'p50 ms':>9} {'p99 ms':>9} {'alloc/read KB':>14}"
+        print(header)
+        print("-" * len(header))
+        for decrypt in (False, True):
+            for mode in MODES:
+                latencies = measure(clients[mode], names, args.repeat, decrypt)
+                allocated = allocated_per_read(clients[mode], names, decrypt)
+                r = {
+                    "p50_ms": round(1000 * statistics.median(latencies), 3),
+                    "p99_ms": round(1000 * percentile(latencies, 0.99), 3),
+                    "alloc_per_read_kb": round(allocated / 1024, 1),
+                }
+                results[f"{mode}/{'decrypt' if decrypt else 'read'}"] = r
+                print(f"{mode:<8} {'yes' if decrypt else 'no':<8} {r['p50_ms']:>9.3f} {r['p99_ms']:>9.3f} "
+                      f"{r['alloc_per_read_kb']:>14.1f}")
+        print(f"Mirror stats: {mirror.stats()}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k != "output"},
+                       "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
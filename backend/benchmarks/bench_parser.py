@@ -0,0 +1,121 @@
+# bench_parser.py
+"""Micro-benchmark: record_parser vs the old per-handler parsing loops.
+
+Usage: python benchmarks/bench_parser.py [--lines N] [--value-size N] [--repeat N]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import record_parser  # noqa: E402
+
+CLINICAL_LABELS = list(record_parser.CLINICAL.fields)
+
+
+# -----------------------------
+# The parsers the handlers used before record_parser
+# -----------------------------
+def legacy_clinical(content):
+    data_dict = {key: "-" for key in record_parser.CLINICAL.fields.values()}
+    for line in content.splitlines():
+        line = line.strip()
+        if line.startswith("Diagnosis:"):
+            data_dict["diagnosis"] = line.replace("Diagnosis:", "").strip()
+        elif line.startswith("Medical History:"):
+            data_dict["medicalHistory"] = line.replace("Medical History:", "").strip()
+        elif line.startswith("Symptoms:"):
+            data_dict["symptoms"] = line.replace("Symptoms:", "").strip()
+        elif line.startswith("Test Results:"):
+            data_dict["testResults"] = line.replace("Test Results:", "").strip()
+        elif line.startswith("Prescriptions:"):
+            data_dict["prescriptions"] = line.replace("Prescriptions:", "").strip()
+        elif line.startswith("Doctor Notes:"):
+            data_dict["doctorNotes"] = line.replace("Doctor Notes:", "").strip()
+        elif line.startswith("Allergies:"):
+            data_dict["allergies"] = line.replace("Allergies:", "").strip()
+        elif line.startswith("Referred To:"):
+            data_dict["referredTo"] = line.replace("Referred To:", "").strip()
+        elif line.startswith("Doctor assigned:"):
+            data_dict["doctorAssigned"] = line.replace("Doctor assigned:", "").strip()
+    return data_dict
+
+
+def legacy_billing(content):
+    patient_data = {}
+    for line in content.splitlines():
+        if ":" in line:
+            key, value = line.split(":", 1)
+            patient_data[key.strip()] = value.strip()
+    patient_data["Payment_status"] = patient_data.get("Payment_status", "pending").lower()
+    return patient_data
+
+
+# -----------------------------
+# Synthetic records
+# -----------------------------
+def _value(rng, size):
+    return "".join(rng.choice(string.ascii_letters + " ") for _ in range(size)).strip() or "x"
+
+
+def clinical_record(rng, lines, value_size):
+    # Mostly free-text history lines, with the known labels sprinkled in
+    out = []
+    for i in range(lines):
+        if i % 10 == 0:
+            label = CLINICAL_LABELS[(i // 10) % len(CLINICAL_LABELS)]
+        else:
+            label = "Note"
+        out.append(f"{label}: {_value(rng, value_size)}")
+    return "\n".join(out)
+
+
+def billing_record(rng, lines, value_size):
+    out = [f"Field_{i}: {_value(rng, value_size)}" for i in range(lines)]
+    out.append("Payment_status: PENDING")
+    return "\n".join(out)
+
+
+def bench(name, func, content, repeat):
+    number = max(1, 2000 // max(1, content.count("\n")))
+    best = min(timeit.repeat(lambda: func(content), number=number, repeat=repeat)) / number
+    print(f"  {name:<24} {best * 1e6:10.1f} us/record")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--value-size", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(1234)
+    cases = [
+        ("clinical", clinical_record(rng, args.lines, args.value_size), legacy_clinical, record_parser.CLINICAL),
+        ("billing", billing_record(rng, args.lines, args.value_size), legacy_billing, record_parser.BILLING),
+    ]
+
+    for name, content, legacy, schema in cases:
+        assert schema.parse(content) == legacy(content), f"{name}: parsers disagree"
+
+        def streaming(text, schema=schema):
+            data = text.encode()
+            p = schema.parser()
+            for i in range(0, len(data), 64 * 1024):
+                p.feed(data[i:i + 64 * 1024])
+            return p.close()
+
+        print(f"{name}: {args.lines} lines, {len(content) / 1024:.0f} KiB")
+        old = bench("legacy", legacy, content, args.repeat)
+        new = bench("record_parser", schema.parse, content, args.repeat)
+        bench("record_parser (stream)", streaming, content, args.repeat)
+        print(f"  speedup                  {old / new:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
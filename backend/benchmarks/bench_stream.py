@@ -0,0 +1,161 @@
+# bench_stream.py
+"""Benchmark: whole-blob readall() vs the range-read streaming path.
+
+For each record size a real AES-GCM record is generated once, then each
+mode runs in a fresh subprocess against an in-process fake container so its
+peak RSS can be measured in isolation (Linux only: the VmHWM peak is reset
+after setup and compared with the RSS at that point). Latency is the median over --repeat fetches.
+
+Example:
+    python benchmarks/bench_stream.py --sizes-mb 4,16,64 \\
+        --download-latency-ms 10 --bandwidth-mbps 400
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import aes_engine  # noqa: E402
+import blob_stream  # noqa: E402
+import record_parser  # noqa: E402
+
+PASSWORD = "GP_Doctor#Secure1"
+BLOB_NAME = "patient_100000.enc"
+MODES = ["readall", "stream"]
+
+
+def make_record(size):
+    """A layer B record of roughly ``size`` bytes: a long run of test results."""
+    line = "Test Results: " + "x" * 240 + "\n"
+    lines = ["Diagnosis: benchmark\n", "Doctor assigned: Dr Bench\n"]
+    lines += [line] * max(1, size // len(line))
+    return "".join(lines).encode()
+
+
+def _status_kb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def reset_peak_rss():
+    """Start a new peak-RSS window so setup allocations do not count."""
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+def peak_rss_kb():
+    return _status_kb("VmHWM")
+
+
+def current_rss_kb():
+    return _status_kb("VmRSS")
+
+
+# -----------------------------
+# One mode, in its own process
+# -----------------------------
+def fetch_readall(container_client, size, args):
+    encrypted = container_client.download_blob(BLOB_NAME).readall()
+    content = aes_engine.decrypt_bytes(PASSWORD, encrypted).decode(errors="ignore")
+    return record_parser.CLINICAL.parse(content)
+
+
+def fetch_stream(container_client, size, args):
+    return blob_stream.fetch_record(
+        container_client, BLOB_NAME, size, PASSWORD, record_parser.CLINICAL,
+        chunk_size=args.chunk_kb * 1024, parallel=args.parallel, memory_cap=args.memory_cap_mb * 1024 * 1024,
+    )
+
+
+def run_child(args):
+    import fakes
+
+    container_client = fakes.FakeContainerClient(
+        "layer-b", download_latency_ms=args.download_latency_ms, bandwidth_mbps=args.bandwidth_mbps)
+    with open(args.blob_file, "rb") as f:
+        container_client.upload_blob(BLOB_NAME, f.read())
+    size = container_client.get_blob_client(BLOB_NAME).get_blob_properties().size
+    fetch = fetch_readall if args.child == "readall" else fetch_stream
+
+    reset_peak_rss()
+    baseline_kb = current_rss_kb()
+    latencies = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        record = fetch(container_client, size, args)
+        latencies.append(time.perf_counter() - started)
+        assert record["diagnosis"] == "benchmark"
+        del record
+    peak_kb = peak_rss_kb()
+
+    print(json.dumps({
+        "p50_ms": round(1000 * statistics.median(latencies), 2),
+        "min_ms": round(1000 * min(latencies), 2),
+        "peak_rss_delta_mb": round(max(0, peak_kb - baseline_kb) / 1024, 1),
+    }))
+
+
+# -----------------------------
+# Driver
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="readall() vs range-read streaming for large records.")
+    parser.add_argument("--sizes-mb", default="4,16,64", help="comma-separated record sizes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-kb", type=int, default=blob_stream.CHUNK_SIZE // 1024)
+    parser.add_argument("--parallel", type=int, default=blob_stream.PARALLEL)
+    parser.add_argument("--memory-cap-mb", type=int, default=blob_stream.MEMORY_CAP // (1024 * 1024))
+    parser.add_argument("--download-latency-ms", type=float, default=5, help="per request")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0, help="per request; 0 = unlimited")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--blob-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    passthrough = [
+        "--repeat", str(args.repeat), "--chunk-kb", str(args.chunk_kb), "--parallel", str(args.parallel),
+        "--memory-cap-mb", str(args.memory_cap_mb), "--download-latency-ms", str(args.download_latency_ms),
+        "--bandwidth-mbps", str(args.bandwidth_mbps),
+    ]
+    results = {}
+    header = f"{'size MB':>8} {'mode':<8} {'p50 ms':>9} {'min ms':>9} {'peak RSS +MB':>13}"
+    print(header)
+    print("-" * len(header))
+    for size_mb in [float(s) for s in args.sizes_mb.split(",") if s]:
+        with tempfile.NamedTemporaryFile(suffix=".enc") as blob_file:
+            blob_file.write(aes_engine.encrypt_bytes(PASSWORD, make_record(int(size_mb * 1024 * 1024))))
+            blob_file.flush()
+            for mode in MODES:
+                out = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--child", mode, "--blob-file", blob_file.name]
+                    + passthrough,
+                    capture_output=True, text=True, check=True,
+                )
+                r = json.loads(out.stdout.strip().splitlines()[-1])
+                results[f"{size_mb:g}MB/{mode}"] = r
+                print(f"{size_mb:>8g} {mode:<8} {r['p50_ms']:>9.1f} {r['min_ms']:>9.1f} {r['peak_rss_delta_mb']:>13.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k not in ("output", "child", "blob_file")},
+                       "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
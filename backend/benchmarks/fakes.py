@@ -0,0 +1,254 @@
+# fakes.py
+"""In-process stand-ins for Azure Blob Storage, Key Vault and the AES step.
+
+They implement only the parts of the SDK surface the backend uses, with an
+optional per-call delay to imitate network latency, so the /api/* endpoints
+can be measured without live Azure.
+"""
+import hashlib
+import itertools
+import os
+import random
+import string
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceModifiedError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aes_engine  # noqa: E402
+import record_parser  # noqa: E402
+
+
+def _sleep_ms(ms):
+    if ms:
+        time.sleep(ms / 1000.0)
+
+
+# -----------------------------
+# Blob storage
+# -----------------------------
+class FakeBlobProperties:
+    def __init__(self, name, etag, size, last_modified):
+        self.name = name
+        self.etag = etag
+        self.size = size
+        self.last_modified = last_modified
+
+
+class FakeDownloader:
+    def __init__(self, data, properties, chunk_size=4 * 1024 * 1024):
+        self._data = data
+        self.properties = properties
+        self.size = len(data)
+        self._chunk_size = chunk_size
+
+    def readall(self):
+        # A real download lands in a fresh buffer; copy so memory use is comparable
+        return bytes(memoryview(self._data))
+
+    def chunks(self):
+        for offset in range(0, len(self._data), self._chunk_size):
+            yield self._data[offset:offset + self._chunk_size]
+
+
+class FakeBlobPages:
+    def __init__(self, items, page_size, start):
+        self._items = items
+        self._page_size = page_size
+        self._position = start
+        self._started = False
+        self.continuation_token = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._started and self.continuation_token is None:
+            raise StopIteration
+        self._started = True
+        page = self._items[self._position:self._position + self._page_size]
+        self._position += self._page_size
+        self.continuation_token = str(self._position) if self._position < len(self._items) else None
+        return iter(page)
+
+
+class FakeBlobListing:
+    def __init__(self, items, page_size):
+        self._items = items
+        self._page_size = page_size or 5000
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def by_page(self, continuation_token=None):
+        return FakeBlobPages(self._items, self._page_size, int(continuation_token or 0))
+
+
+class FakeBlobClient:
+    """Like the SDK, blob properties come from a per-blob client."""
+
+    def __init__(self, container_client, name):
+        self._container_client = container_client
+        self.blob_name = name
+
+    def get_blob_properties(self, **kwargs):
+        return self._container_client._get_blob_properties(self.blob_name)
+
+
+class FakeContainerClient:
+    def __init__(self, name, list_latency_ms=0, download_latency_ms=0, bandwidth_mbps=0):
+        self.container_name = name
+        self.list_latency_ms = list_latency_ms
+        self.download_latency_ms = download_latency_ms
+        # Per-request throughput limit, as for a single HTTP stream; 0 = unlimited
+        self.bandwidth_mbps = bandwidth_mbps
+        self._lock = threading.Lock()
+        self._blobs = {}   # name -> (data, properties)
+        self._etags = itertools.count(1)
+        self.calls = {"list_blobs": 0, "download_blob": 0, "get_blob_properties": 0}
+
+    def upload_blob(self, name, data, overwrite=True):
+        with self._lock:
+            properties = FakeBlobProperties(name, f'"0x{next(self._etags):x}"', len(data),
+                                            datetime.now(timezone.utc))
+            self._blobs[name] = (bytes(data), properties)
+        return properties
+
+    def delete_blob(self, name):
+        with self._lock:
+            del self._blobs[name]
+
+    def list_blobs(self, results_per_page=None, **kwargs):
+        _sleep_ms(self.list_latency_ms)
+        with self._lock:
+            self.calls["list_blobs"] += 1
+            items = [properties for _, properties in sorted(self._blobs.values(), key=lambda v: v[1].name)]
+        return FakeBlobListing(items, results_per_page)
+
+    def get_blob_client(self, name):
+        return FakeBlobClient(self, name)
+
+    def _get_blob_properties(self, name):
+        _sleep_ms(self.download_latency_ms)
+        with self._lock:
+            self.calls["get_blob_properties"] += 1
+            return self._blobs[name][1]
+
+    def download_blob(self, name, offset=None, length=None, etag=None, match_condition=None, **kwargs):
+        _sleep_ms(self.download_latency_ms)
+        with self._lock:
+            self.calls["download_blob"] += 1
+            data, properties = self._blobs[name]
+        if match_condition == MatchConditions.IfNotModified and etag != properties.etag:
+            raise ResourceModifiedError("The condition specified using HTTP conditional header(s) is not met.")
+        if offset is not None:
+            end = len(data) if length is None else offset + length
+            data = data[offset:end]
+        if self.bandwidth_mbps:
+            _sleep_ms(len(data) * 8 / (self.bandwidth_mbps * 1000.0))
+        return FakeDownloader(data, properties)
+
+
+class FakeBlobServiceClient:
+    def __init__(self, container_names, list_latency_ms=0, download_latency_ms=0):
+        self.containers = {
+            name: FakeContainerClient(name, list_latency_ms, download_latency_ms)
+            for name in container_names
+        }
+
+    def get_container_client(self, name):
+        return self.containers[name]
+
+
+# -----------------------------
+# Key Vault
+# -----------------------------
+class _FakeSecret:
+    def __init__(self, value, version):
+        self.value = value
+        self.properties = type("SecretProperties", (), {"version": version})()
+
+
+class FakeSecretClient:
+    def __init__(self, secrets, latency_ms=0):
+        self._secrets = dict(secrets)
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def get_secret(self, name):
+        _sleep_ms(self.latency_ms)
+        self.calls += 1
+        return _FakeSecret(self._secrets[name], "1")
+
+
+# -----------------------------
+# AES step
+# -----------------------------
+FAKE_MAGIC = b"FAKEAES1"
+
+
+def fake_encrypt(password, plaintext):
+    """Same framing as aes_gcm.exe but no KDF or cipher, to isolate server overhead."""
+    return FAKE_MAGIC + hashlib.sha256(password.encode()).digest()[:16] + plaintext
+
+
+def fake_decrypt(password, data):
+    header = FAKE_MAGIC + hashlib.sha256(password.encode()).digest()[:16]
+    if bytes(data[:len(header)]) != header:
+        raise aes_engine.DecryptionError("Decryption failed")
+    return bytes(data[len(header):])
+
+
+# -----------------------------
+# Synthetic records
+# -----------------------------
+def _text(rng, size):
+    return "".join(rng.choice(string.ascii_letters + " ") for _ in range(size)).strip() or "x"
+
+
+def synthetic_record(layer, patient_id, rng, extra_lines=0, value_size=40):
+    if layer == "B":
+        lines = [f"{label}: {_text(rng, value_size)}" for label in record_parser.CLINICAL.fields]
+        lines += [f"Medical History: {_text(rng, value_size)}" for _ in range(extra_lines)]
+    elif layer == "A":
+        lines = [
+            f"Patient_id: {patient_id}",
+            f"Name: {_text(rng, 16)}",
+            f"Phone: {rng.randint(6000000000, 9999999999)}",
+            f"Address: {_text(rng, value_size)}",
+        ]
+        lines += [f"Note_{i}: {_text(rng, value_size)}" for i in range(extra_lines)]
+    else:
+        lines = [
+            f"Patient_id: {patient_id}",
+            f"Admission_date: 2025-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+            f"Room_alloted: {rng.randint(100, 499)}",
+            f"Doctor_assigned: Dr {_text(rng, 8)}",
+            f"Treatment_cost: {rng.randint(1000, 90000)}",
+            f"Insurance_provider: {_text(rng, 12)}",
+            f"Payment_status: {rng.choice(['Pending', 'Paid', 'Discharged'])}",
+        ]
+        lines += [f"Item_{i}: {_text(rng, value_size)}" for i in range(extra_lines)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def populate(service_client, containers, passwords, patients, extra_lines=0, fake_aes=False, seed=1234):
+    """Fill layers A, B and C with ``patients`` encrypted records each.
+
+    ``containers`` maps layer -> container name, ``passwords`` layer -> password.
+    Returns the list of patient IDs written.
+    """
+    rng = random.Random(seed)
+    encrypt = fake_encrypt if fake_aes else aes_engine.encrypt_bytes
+    patient_ids = [100000 + i for i in range(patients)]
+    for layer, container_name in containers.items():
+        container_client = service_client.get_container_client(container_name)
+        for patient_id in patient_ids:
+            plaintext = synthetic_record(layer, patient_id, rng, extra_lines)
+            container_client.upload_blob(f"patient_{patient_id}.enc", encrypt(passwords[layer], plaintext))
+    return patient_ids
@@ -0,0 +1,257 @@
+# loadtest.py
+"""Load-test the /api/* endpoints against in-process fakes.
+
+Blob Storage, Key Vault and (optionally) the AES step are replaced by the
+stand-ins in fakes.py, synthetic records are generated for layers A, B and
+C, and each scenario is driven through the Flask app at the requested
+concurrency. Throughput and p50/p95/p99 latency are printed and saved as
+JSON; pass --baseline to compare against an earlier run. With
+--bulk-concurrency, that many clients keep refreshing the billing data for
+the whole of each other scenario, to show how lookups fare next to bulk work.
+
+Example:
+    python benchmarks/loadtest.py --patients 500 --concurrency 16 \\
+        --download-latency-ms 20 --output results.json --baseline before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# The blob index persists to disk; keep benchmark runs out of the real one.
+os.environ.setdefault("BLOB_INDEX_DIR", tempfile.mkdtemp(prefix="ehr-bench-index-"))
+
+import fakes  # noqa: E402
+
+SCENARIOS = ["login", "gp", "cardio", "ortho", "frontdesk", "batch", "billing"]
+SINGLE_PATIENT = {
+    "gp": ("/api/fetch_gp_data", "B"),
+    "cardio": ("/api/fetch_cardio_data", "B"),
+    "ortho": ("/api/fetch_ortho_data", "B"),
+    "frontdesk": ("/api/fetch_frontdesk_data", "A"),
+}
+LAYER_USERS = {"A": "FrontDesk", "B": "GP", "C": "BillingDesk"}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def setup_backend(args):
+    import blob_clients
+    import handlers
+    from secret_provider import CachedSecretProvider, KeyVaultSecretSource
+
+    service_client = fakes.FakeBlobServiceClient(
+        handlers.CONTAINERS.values(),
+        list_latency_ms=args.list_latency_ms,
+        download_latency_ms=args.download_latency_ms,
+    )
+    passwords = {layer: handlers.PASSWORDS[user] for layer, user in LAYER_USERS.items()}
+    patient_ids = fakes.populate(service_client, handlers.CONTAINERS, passwords, args.patients,
+                                 extra_lines=args.record_lines, fake_aes=args.fake_aes)
+
+    blob_clients.init_blob_clients(None, handlers.CONTAINERS, service_client=service_client)
+    secret_client = fakes.FakeSecretClient({"KmasterSecret": "bench-kmaster"}, latency_ms=args.secret_latency_ms)
+    handlers.KMASTER_PROVIDER = CachedSecretProvider(KeyVaultSecretSource(secret_client), "KmasterSecret")
+    if args.fake_aes:
+        handlers.decrypt_bytes = fakes.fake_decrypt
+    if args.no_cache:
+        handlers.RECORD_CACHE.max_entries = 0
+        handlers.BILLING_STORE.max_credentials = 0
+    handlers.startup()
+    if args.sessions:
+        # What the dashboards send after login: a session token, not the password
+        credentials = {layer: {"token": handlers.SESSIONS.create(user, passwords[layer])[0]}
+                       for layer, user in LAYER_USERS.items()}
+    else:
+        credentials = {layer: {"password": password} for layer, password in passwords.items()}
+    return handlers, patient_ids, credentials
+
+
+def make_request(client, handlers, scenario, patient_ids, credentials, rng):
+    if scenario == "login":
+        username = rng.choice(list(handlers.PASSWORDS))
+        response = client.post("/api/get_challenge", json={"username": username})
+        if response.status_code != 200:
+            return response.status_code
+        response = client.post("/api/verify_login", json={
+            "username": username,
+            "password": handlers.PASSWORDS[username],
+            "system_id": handlers.SYSTEM_IDS[username],
+            "challenge": response.get_json()["challenge"],
+        })
+    elif scenario in SINGLE_PATIENT:
+        path, layer = SINGLE_PATIENT[scenario]
+        response = client.post(path, json={"patientId": rng.choice(patient_ids), **credentials[layer]})
+    elif scenario == "batch":
+        ids = rng.sample(patient_ids, min(50, len(patient_ids)))
+        response = client.post("/api/fetch_batch_data", json={"layer": "B", "patientIds": ids, **credentials["B"]})
+    else:
+        response = client.post("/api/fetch_billingdesk_data", json=credentials["C"])
+    return response.status_code
+
+
+def run_bulk_load(app, handlers, concurrency, patient_ids, credentials, stop):
+    """Billing refreshes in a loop until ``stop`` is set; returns status counts."""
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker(seed):
+        client = app.test_client()
+        rng = random.Random(seed)
+        while not stop.is_set():
+            try:
+                status = make_request(client, handlers, "billing", patient_ids, credentials, rng)
+            except Exception:
+                status = 599
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+            if status == 503:
+                stop.wait(0.05)
+
+    threads = [threading.Thread(target=worker, args=(1000 + i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    return threads, statuses
+
+
+def run_scenario(app, handlers, scenario, requests, concurrency, patient_ids, credentials, bulk_concurrency=0):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    remaining = [requests]
+    stop = threading.Event()
+    bulk_threads, bulk_statuses = [], {}
+    if bulk_concurrency and scenario != "billing":
+        bulk_threads, bulk_statuses = run_bulk_load(app, handlers, bulk_concurrency, patient_ids, credentials, stop)
+        time.sleep(0.2)   # let the billing scans get going first
+
+    def worker(seed):
+        nonlocal errors
+        client = app.test_client()
+        rng = random.Random(seed)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                status = make_request(client, handlers, scenario, patient_ids, credentials, rng)
+            except Exception:
+                status = 599
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if status >= 400:
+                    errors += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duration = time.perf_counter() - started
+    stop.set()
+    for t in bulk_threads:
+        t.join()
+
+    latencies.sort()
+    result = {
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "duration_s": round(duration, 4),
+        "throughput_rps": round(len(latencies) / duration, 2) if duration else 0.0,
+        "mean_ms": round(1000 * sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "p50_ms": round(1000 * percentile(latencies, 50), 3),
+        "p95_ms": round(1000 * percentile(latencies, 95), 3),
+        "p99_ms": round(1000 * percentile(latencies, 99), 3),
+    }
+    if bulk_threads:
+        result["bulk_statuses"] = {str(k): v for k, v in sorted(bulk_statuses.items())}
+    return result
+
+
+def print_results(results, baseline):
+    header = f"{'scenario':<10} {'reqs':>6} {'err':>4} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for scenario, r in results.items():
+        bulk = ", ".join(f"{k}: {v}" for k, v in r.get("bulk_statuses", {}).items())
+        print(f"{scenario:<10} {r['requests']:>6} {r['errors']:>4} {r['throughput_rps']:>9.1f} "
+              f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}"
+              + (f"   bulk {bulk}" if bulk else ""))
+        base = baseline.get(scenario) if baseline else None
+        if base:
+            def delta(key):
+                return (r[key] - base[key]) / base[key] * 100 if base[key] else 0.0
+            print(f"{'  vs base':<10} {'':>6} {'':>4} {delta('throughput_rps'):>+8.1f}% "
+                  f"{delta('p50_ms'):>+8.1f}% {delta('p95_ms'):>+8.1f}% {delta('p99_ms'):>+8.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the backend against local fakes.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--patients", type=int, default=200, help="records per layer")
+    parser.add_argument("--record-lines", type=int, default=0, help="extra lines per record")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--billing-requests", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--bulk-concurrency", type=int, default=0,
+                        help="clients refreshing billing data in the background of each scenario")
+    parser.add_argument("--list-latency-ms", type=float, default=0)
+    parser.add_argument("--download-latency-ms", type=float, default=0)
+    parser.add_argument("--secret-latency-ms", type=float, default=0)
+    parser.add_argument("--fake-aes", action="store_true", help="skip PBKDF2/AES to isolate server overhead")
+    parser.add_argument("--no-cache", action="store_true", help="disable the parsed-record cache and billing store")
+    parser.add_argument("--sessions", action="store_true", help="authenticate fetches with session tokens")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    args = parser.parse_args()
+
+    handlers, patient_ids, credentials = setup_backend(args)
+    import server
+
+    results = {}
+    for scenario in [s for s in args.scenarios.split(",") if s]:
+        if scenario not in SCENARIOS:
+            parser.error(f"unknown scenario {scenario}")
+        requests = args.billing_requests if scenario == "billing" else args.requests
+        results[scenario] = run_scenario(server.app, handlers, scenario, requests, args.concurrency,
+                                         patient_ids, credentials, args.bulk_concurrency)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "python": platform.python_version(),
+                "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# billing_store.py
+"""Incrementally maintained billing records and aggregates for layer C.
+
+The store keeps every billing blob's parsed record keyed by the blob's etag.
+A sync refreshes the container's blob index (a metadata-only listing diff),
+then downloads and decrypts only blobs that are new or whose etag changed,
+and drops deleted ones. Totals by Payment_status are kept up to date as
+records change, so a dashboard refresh costs one listing instead of one
+PBKDF2 + AES decrypt per blob.
+
+State is held per credential fingerprint, and parsed records are sealed
+with AES-GCM under a key derived from that credential (credential_seal.py,
+as for record_cache.py).
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import record_pipeline
+from credential_seal import CredentialSeal, seal, unseal
+
+MAX_CREDENTIALS = int(os.environ.get("BILLING_STORE_MAX_CREDENTIALS", "4"))
+# Refreshes closer together than this reuse the previous sync
+MIN_SYNC_INTERVAL = float(os.environ.get("BILLING_STORE_MIN_SYNC", "2"))
+
+STATUS_FIELD = "Payment_status"
+AMOUNT_FIELD = "Treatment_cost"
+AMOUNT_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+SyncResult = namedtuple("SyncResult", ["processed", "removed", "unchanged", "failures"])
+_BlobRef = namedtuple("_BlobRef", ["name", "etag"])
+_Failed = namedtuple("_Failed", ["error"])
+
+
+def parse_amount(value):
+    """Treatment_cost as a number; tolerates currency signs and thousands separators."""
+    match = AMOUNT_RE.search(str(value or "").replace(",", ""))
+    return float(match.group(0)) if match else 0.0
+
+
+class _Ledger:
+    """Everything the store knows under one credential."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = {}     # blob name -> (etag, status, amount, sealed record)
+        self.failures = {}    # blob name -> (etag, error); decrypt/parse errors only
+        self.totals = {}      # status -> [count, amount]
+        self.synced_at = 0.0
+        self.last_sync = SyncResult(0, 0, 0, [])
+
+    def add(self, blob_name, etag, status, amount, sealed):
+        self.remove(blob_name)
+        self.records[blob_name] = (etag, status, amount, sealed)
+        total = self.totals.setdefault(status, [0, 0.0])
+        total[0] += 1
+        total[1] += amount
+
+    def remove(self, blob_name):
+        self.failures.pop(blob_name, None)
+        old = self.records.pop(blob_name, None)
+        if old is None:
+            return
+        _, status, amount, _ = old
+        total = self.totals[status]
+        total[0] -= 1
+        total[1] -= amount
+        if total[0] == 0:
+            del self.totals[status]
+
+    def etag(self, blob_name):
+        item = self.records.get(blob_name) or self.failures.get(blob_name)
+        return item[0] if item else None
+
+
+class BillingSummaryStore:
+    def __init__(self, index, container_factory, processor_factory,
+                 max_credentials=MAX_CREDENTIALS, min_sync_interval=MIN_SYNC_INTERVAL):
+        """``index`` is layer C's BlobIndex; ``processor_factory(password)``
+        returns the ``process(blob_name, encrypted)`` used by record_pipeline."""
+        self.index = index
+        self._container_factory = container_factory
+        self._processor_factory = processor_factory
+        self.max_credentials = max_credentials
+        self.min_sync_interval = min_sync_interval
+        self._seal = CredentialSeal()
+        self._lock = threading.Lock()
+        self._ledgers = OrderedDict()   # credential fingerprint -> _Ledger
+
+    # -----------------------------
+    # Credential handling
+    # -----------------------------
+    def _ledger(self, password):
+        fingerprint = self._seal.fingerprint(password)
+        with self._lock:
+            ledger = self._ledgers.get(fingerprint)
+            if ledger is None:
+                ledger = self._ledgers[fingerprint] = _Ledger()
+            self._ledgers.move_to_end(fingerprint)
+            while len(self._ledgers) > self.max_credentials:
+                self._ledgers.popitem(last=False)
+            return ledger
+
+    # -----------------------------
+    # Sync
+    # -----------------------------
+    def sync(self, password):
+        """Bring the store up to date for ``password``; returns (ledger, SyncResult).
+
+        Concurrent callers with the same credential wait for one sync.
+        """
+        ledger = self._ledger(password)
+        with ledger.lock:
+            if time.monotonic() - ledger.synced_at < self.min_sync_interval:
+                return ledger, ledger.last_sync
+
+            self.index.ensure_ready()
+            self.index.refresh()
+            entries = self.index.entries()
+
+            removed = [name for name in list(ledger.records) + list(ledger.failures) if name not in entries]
+            for name in removed:
+                ledger.remove(name)
+
+            stale = [
+                _BlobRef(name, entry.get("etag"))
+                for name, entry in sorted(entries.items())
+                if entry.get("etag") is None or ledger.etag(name) != entry.get("etag")
+            ]
+
+            inner = self._processor_factory(password)
+
+            def process(blob_name, encrypted):
+                # Decrypt/parse errors are permanent for this etag; download
+                # errors surface as pipeline errors and are retried next sync
+                try:
+                    return inner(blob_name, encrypted)
+                except Exception as e:
+                    return _Failed(str(e) or type(e).__name__)
+
+            aead = self._seal.aead(password)
+            etags = {ref.name: ref.etag for ref in stale}
+            transient = []
+            container_client = self._container_factory()
+            for result in record_pipeline.iter_records(container_client, stale, process, layer="C"):
+                if result.error is not None:
+                    print(f"ERROR processing {result.blob_name}: {result.error}")
+                    transient.append({"blob": result.blob_name, "error": result.error})
+                elif isinstance(result.record, _Failed):
+                    print(f"ERROR processing {result.blob_name}: {result.record.error}")
+                    ledger.remove(result.blob_name)
+                    ledger.failures[result.blob_name] = (etags[result.blob_name], result.record.error)
+                else:
+                    record = result.record
+                    sealed = seal(aead, record)
+                    ledger.add(result.blob_name, etags[result.blob_name],
+                               record.get(STATUS_FIELD, "pending"), parse_amount(record.get(AMOUNT_FIELD)),
+                               sealed)
+
+            ledger.synced_at = time.monotonic()
+            ledger.last_sync = SyncResult(
+                processed=len(stale),
+                removed=len(removed),
+                unchanged=len(entries) - len(stale),
+                failures=transient,
+            )
+            return ledger, ledger.last_sync
+
+    # -----------------------------
+    # Views
+    # -----------------------------
+    def records(self, password):
+        """(records, failures) in blob-name order, as the listing returns them."""
+        ledger, sync = self.sync(password)
+        aead = self._seal.aead(password)
+        with ledger.lock:
+            items = sorted(ledger.records.items())
+            failures = [{"blob": name, "error": error} for name, (_, error) in sorted(ledger.failures.items())]
+        records = []
+        for _, (_, _, _, sealed) in items:
+            records.append(unseal(aead, sealed))
+        failures += sync.failures
+        return records, sorted(failures, key=lambda f: f["blob"] or "")
+
+    def summary(self, password):
+        """Counts and Treatment_cost totals by Payment_status, from precomputed state."""
+        ledger, sync = self.sync(password)
+        with ledger.lock:
+            by_status = {
+                status: {"count": count, "amount": round(amount, 2)}
+                for status, (count, amount) in sorted(ledger.totals.items())
+            }
+            failed = len(ledger.failures) + len(sync.failures)
+        return {
+            "count": sum(v["count"] for v in by_status.values()),
+            "failed": failed,
+            "totalAmount": round(sum(v["amount"] for v in by_status.values()), 2),
+            "pendingAmount": by_status.get("pending", {}).get("amount", 0.0),
+            "byStatus": by_status,
+            "sync": {"processed": sync.processed, "removed": sync.removed, "unchanged": sync.unchanged},
+        }
+
@@ -0,0 +1,78 @@
+# blob_clients.py
+"""Process-wide Azure Blob clients.
+
+One BlobServiceClient is created per process over a requests session with a
+sized connection pool, and one ContainerClient per layer is derived from it,
+so every request reuses the same transport and TLS connections. The SDK
+clients are safe to share between worker threads.
+"""
+import os
+import threading
+
+import requests
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import BlobServiceClient
+
+POOL_SIZE = int(os.environ.get("BLOB_POOL_SIZE", "32"))
+
+_lock = threading.Lock()
+_session = None
+_service_client = None
+_container_clients = {}
+
+
+def _build_session(pool_size):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def init_blob_clients(connection_string, containers, pool_size=POOL_SIZE, service_client=None):
+    """Create the shared clients. ``service_client`` lets tests plug in a stub."""
+    global _session, _service_client, _container_clients
+
+    with _lock:
+        if service_client is None:
+            _session = _build_session(pool_size)
+            transport = RequestsTransport(session=_session, session_owner=False)
+            service_client = BlobServiceClient.from_connection_string(
+                connection_string, transport=transport
+            )
+        _service_client = service_client
+        _container_clients = {
+            layer: service_client.get_container_client(name)
+            for layer, name in containers.items()
+        }
+
+
+def get_container_client(layer):
+    with _lock:
+        container_client = _container_clients.get(layer)
+    if container_client is None:
+        raise RuntimeError("Blob clients not initialised; call init_blob_clients() first")
+    return container_client
+
+
+def is_initialised():
+    with _lock:
+        return _service_client is not None
+
+
+def pool_stats():
+    """Connections opened vs requests served per host, to confirm reuse."""
+    with _lock:
+        session = _session
+    if session is None:
+        return {}
+
+    stats = {}
+    for adapter in session.adapters.values():
+        for key in adapter.poolmanager.pools.keys():
+            pool = adapter.poolmanager.pools[key]
+            stats[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+                "connections": pool.num_connections,
+                "requests": pool.num_requests,
+            }
+    return stats
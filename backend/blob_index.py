@@ -0,0 +1,267 @@
+# blob_index.py
+"""Per-container patient ID -> blob name index.
+
+The index is built from a container listing once, persisted as JSON next to
+the backend and refreshed incrementally afterwards, so a patient lookup is a
+single dictionary hit instead of a scan over every blob in the container.
+
+A blob is indexed under its file name stem ("P1023.enc" -> "P1023") and
+under the patient ID in that stem, its last run of digits
+("v2_patient_1023.enc" -> "1023"). A non-numeric ID that matches neither
+falls back to the old substring match against the indexed blob names.
+
+An unknown ID refreshes the index, unless the last refresh was itself
+caused by a miss less than BLOB_INDEX_MIN_REFRESH seconds ago; so a blob
+uploaded in that window is not found until the window has passed.
+"""
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+import metrics
+
+INDEX_DIR = os.environ.get(
+    "BLOB_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".blob_index"),
+)
+
+# The patient ID is the last run of digits in the blob's file name stem
+# ("patient_210014.enc" -> "210014").
+PATIENT_ID_RE = re.compile(r"\d+")
+
+# Lookup misses trigger a refresh at most this often.
+MIN_REFRESH_INTERVAL = float(os.environ.get("BLOB_INDEX_MIN_REFRESH", "30"))
+
+
+def normalize_patient_id(patient_id):
+    patient_id_str = str(patient_id).strip()
+    if patient_id_str.isdigit():
+        return str(int(patient_id_str))
+    return patient_id_str
+
+
+def blob_stem(blob_name):
+    return os.path.splitext(os.path.basename(blob_name))[0]
+
+
+def patient_id_from_blob_name(blob_name):
+    digits = PATIENT_ID_RE.findall(blob_stem(blob_name))
+    if not digits:
+        return None
+    return normalize_patient_id(digits[-1])
+
+
+def _timestamp(value):
+    if value is None:
+        return 0.0
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+def _patient_map(blobs):
+    by_patient = {}
+    # Stems before digit IDs; otherwise the first blob name in listing order
+    # wins, as the old scan did.
+    names = sorted(blobs)
+    for key_of in (lambda name: normalize_patient_id(blob_stem(name)), patient_id_from_blob_name):
+        for name in names:
+            key = key_of(name)
+            if key is not None and key not in by_patient:
+                by_patient[key] = name
+    return by_patient
+
+
+class BlobIndex:
+    def __init__(self, container_name, container_factory, index_dir=INDEX_DIR):
+        self.container_name = container_name
+        self._container_factory = container_factory
+        self._path = os.path.join(index_dir, f"{container_name}.json")
+        self._lock = threading.RLock()
+        self._blobs = {}        # blob name -> {"patient_id", "etag", "last_modified", "size"}
+        self._by_patient = {}   # patient id -> blob name
+        self._last_sync = 0.0   # newest last_modified seen in the container
+        self._last_refresh = 0.0
+        self._refreshed_on_miss = False
+        self._loaded = False
+        # One listing at a time; callers that queued behind it reuse its result
+        self._refresh_lock = threading.Lock()
+        self._refreshes = 0
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def load(self):
+        with self._lock:
+            self._loaded = True
+            try:
+                with open(self._path, "r") as f:
+                    state = json.load(f)
+            except FileNotFoundError:
+                return False
+            except Exception as e:
+                print(f"Blob index for {self.container_name} unreadable, rebuilding: {e}")
+                return False
+
+            self._blobs = state.get("blobs", {})
+            self._last_sync = state.get("last_sync", 0.0)
+            self._by_patient = _patient_map(self._blobs)
+            return True
+
+    def save(self):
+        with self._lock:
+            state = {
+                "container": self.container_name,
+                "last_sync": self._last_sync,
+                "blobs": self._blobs,
+            }
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._path)
+
+    # -----------------------------
+    # Sync
+    # -----------------------------
+    def refresh(self, on_miss=False):
+        """Bring the index up to date with the container.
+
+        Blob listing has no server-side "modified since" filter, so this is a
+        metadata-only listing; only blobs that are new or modified since the
+        last sync are (re)indexed and deleted blobs are dropped.
+
+        Lookups keep being served from the current maps while the listing
+        runs; the new maps are swapped in at the end. A caller that arrives
+        while another refresh is listing waits for it instead of listing
+        again.
+        """
+        refreshes = self._refreshes
+        with self._refresh_lock:
+            if self._refreshes != refreshes:
+                return False
+            with self._lock:
+                blobs = dict(self._blobs)
+                last_sync = self._last_sync
+
+            container_client = self._container_factory()
+            seen = set()
+            changed = False
+            newest = last_sync
+            with metrics.span("list_blobs"):
+                for blob in container_client.list_blobs():
+                    seen.add(blob.name)
+                    modified = _timestamp(getattr(blob, "last_modified", None))
+                    newest = max(newest, modified)
+
+                    entry = blobs.get(blob.name)
+                    if (entry is not None and modified <= last_sync and entry.get("etag") == blob.etag
+                            and "size" in entry):
+                        continue
+
+                    blobs[blob.name] = {
+                        "patient_id": patient_id_from_blob_name(blob.name),
+                        "etag": blob.etag,
+                        "last_modified": modified,
+                        "size": getattr(blob, "size", None),
+                    }
+                    changed = True
+
+            for name in set(blobs) - seen:
+                del blobs[name]
+                changed = True
+            by_patient = _patient_map(blobs) if changed else None
+
+            with self._lock:
+                if changed:
+                    self._blobs = blobs
+                    self._by_patient = by_patient
+                self._last_sync = newest
+                self._last_refresh = time.monotonic()
+                self._refreshed_on_miss = on_miss
+                self._refreshes += 1
+
+            if changed:
+                self.save()
+            return changed
+
+    def ensure_ready(self):
+        with self._lock:
+            if not self._loaded:
+                self.load()
+            refreshed = self._last_refresh != 0.0
+        if not refreshed:
+            self.refresh()
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    def lookup(self, patient_id, refresh=True):
+        """Return the blob name holding ``patient_id`` or None.
+
+        With ``refresh=False`` a miss never triggers a container listing.
+        """
+        self.ensure_ready()
+        key = normalize_patient_id(patient_id)
+        with self._lock:
+            blob_name = self._find(key)
+            if blob_name is not None or not refresh:
+                return blob_name
+            if self._refreshed_on_miss and time.monotonic() - self._last_refresh < MIN_REFRESH_INTERVAL:
+                return None
+
+        # Unknown ID: the blob may have been uploaded since the last sync.
+        self.refresh(on_miss=True)
+        with self._lock:
+            return self._find(key)
+
+    def _find(self, key):
+        # Caller holds the lock
+        blob_name = self._by_patient.get(key)
+        if blob_name is not None or not key or key.isdigit():
+            return blob_name
+        # Free-form IDs keep the old substring match
+        return min((name for name in self._blobs if key in name), default=None)
+
+    def refreshed_within(self, seconds):
+        """True if a listing confirmed every indexed etag in the last ``seconds``."""
+        with self._lock:
+            return self._last_refresh != 0.0 and time.monotonic() - self._last_refresh < seconds
+
+    def entries(self):
+        """Snapshot of blob name -> entry for every indexed blob."""
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._blobs.items()}
+
+    def entry(self, blob_name):
+        with self._lock:
+            entry = self._blobs.get(blob_name)
+            return dict(entry) if entry else None
+
+    def etag(self, blob_name):
+        with self._lock:
+            entry = self._blobs.get(blob_name)
+            return entry.get("etag") if entry else None
+
+    def update_etag(self, blob_name, etag, last_modified, size=None):
+        """Record an etag seen on download so the next lookup sees it.
+
+        Ignored unless the download is at least as new as the indexed
+        version, so a late or stale response never rolls an entry back.
+        """
+        modified = _timestamp(last_modified)
+        with self._lock:
+            entry = self._blobs.get(blob_name)
+            if entry is None or etag is None or last_modified is None:
+                return
+            if modified < entry.get("last_modified", 0.0):
+                return
+            entry["etag"] = etag
+            entry["last_modified"] = modified
+            if size is not None:
+                entry["size"] = size
@@ -0,0 +1,356 @@
+# blob_mirror.py
+"""Optional local mirror of the encrypted containers.
+
+Blobs are stored under BLOB_MIRROR_DIR/objects/ by the SHA-256 of their
+ciphertext, with one manifest per container that maps each blob name to its
+etag, digest, size and when it was last confirmed against the container.
+Only ciphertext is ever written. sync() lists a container and downloads
+just the blobs whose etag changed. Reads are served from mmap'd objects as
+memoryviews, with no network round trip and no copy of the payload.
+
+An entry is served only if it has the etag the caller expects (the one it
+pins, or else the one its blob index holds) and was confirmed within
+BLOB_MIRROR_MAX_STALENESS seconds; otherwise the read falls through to
+Azure. Keep the mirror fresh with
+BLOB_MIRROR_SYNC_INTERVAL or by running the sync command on a schedule:
+
+    python blob_mirror.py sync [A B C]
+"""
+import hashlib
+import json
+import mmap
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+MIRROR_DIR = os.environ.get("BLOB_MIRROR_DIR")   # unset: mirror disabled
+MAX_STALENESS = float(os.environ.get("BLOB_MIRROR_MAX_STALENESS", "300"))
+SYNC_INTERVAL = float(os.environ.get("BLOB_MIRROR_SYNC_INTERVAL", "0"))
+SYNC_WORKERS = int(os.environ.get("BLOB_MIRROR_SYNC_WORKERS", "8"))
+MAX_OPEN = int(os.environ.get("BLOB_MIRROR_MAX_OPEN", "1024"))
+
+# How often a reader checks whether another process (the sync command)
+# rewrote a manifest
+MANIFEST_CHECK_SECONDS = 1.0
+# gc() leaves recent objects alone: a concurrent sync may not have saved the
+# manifest that refers to them yet
+GC_GRACE_SECONDS = 3600
+
+
+class MirrorBlobProperties:
+    def __init__(self, name, entry):
+        self.name = name
+        self.etag = entry["etag"]
+        self.size = entry["size"]
+        modified = entry.get("last_modified")
+        self.last_modified = datetime.fromisoformat(modified) if isinstance(modified, str) else modified
+
+
+class MirrorDownloader:
+    """Same surface as the SDK's StorageStreamDownloader, over a memoryview."""
+
+    def __init__(self, view, properties):
+        self._view = view
+        self.properties = properties
+        self.size = len(view)
+
+    def readall(self):
+        return self._view
+
+    def chunks(self, chunk_size=4 * 1024 * 1024):
+        for offset in range(0, len(self._view), chunk_size):
+            yield self._view[offset:offset + chunk_size]
+
+
+class MirroredContainerClient:
+    """Container client that serves downloads from the mirror when it can.
+
+    ``expected_etag(blob_name)`` gives the etag a caller that does not pin
+    one should get (normally the blob index's); the mirror copy is only used
+    when it matches, so a mirror behind the index never hands out an older
+    version. Everything else (listing, properties) goes to the real client.
+    """
+
+    def __init__(self, mirror, container_name, container_client, expected_etag):
+        self._mirror = mirror
+        self._container_name = container_name
+        self._client = container_client
+        self._expected_etag = expected_etag
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def download_blob(self, blob, offset=None, length=None, etag=None, match_condition=None, **kwargs):
+        expected = etag if match_condition is not None else self._expected_etag(blob)
+        hit = self._mirror.read(self._container_name, blob, expected) if expected is not None else None
+        if hit is not None:
+            view, entry = hit
+            if offset is not None:
+                view = view[offset:len(view) if length is None else offset + length]
+            return MirrorDownloader(view, MirrorBlobProperties(blob, entry))
+
+        if etag is not None:
+            kwargs.update(etag=etag, match_condition=match_condition)
+        return self._client.download_blob(blob, offset=offset, length=length, **kwargs)
+
+
+class BlobMirror:
+    def __init__(self, root, max_staleness=MAX_STALENESS, max_open=MAX_OPEN):
+        self.root = root
+        self.max_staleness = max_staleness
+        self.max_open = max_open
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._manifests = {}    # container -> {"blobs": {name: entry}, "synced_at": float}
+        self._loaded = {}       # container -> (manifest mtime, last checked)
+        self._views = OrderedDict()   # digest -> memoryview over its mmap
+        self._stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    # -----------------------------
+    # Layout
+    # -----------------------------
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest[2:])
+
+    def _manifest_path(self, container_name):
+        return os.path.join(self.root, "manifests", f"{container_name}.json")
+
+    def _load_manifest(self, container_name):
+        try:
+            with open(self._manifest_path(container_name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"blobs": {}, "synced_at": 0.0}
+
+    def _save_manifest(self, container_name, manifest):
+        path = self._manifest_path(container_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+
+    def _manifest(self, container_name):
+        now = time.monotonic()
+        with self._lock:
+            mtime, checked = self._loaded.get(container_name, (None, 0.0))
+            if now - checked < MANIFEST_CHECK_SECONDS:
+                return self._manifests.get(container_name)
+            self._loaded[container_name] = (mtime, now)
+        try:
+            current = os.stat(self._manifest_path(container_name)).st_mtime
+        except FileNotFoundError:
+            return None
+        if current != mtime:
+            manifest = self._load_manifest(container_name)
+            with self._lock:
+                self._manifests[container_name] = manifest
+                self._loaded[container_name] = (current, now)
+        with self._lock:
+            return self._manifests.get(container_name)
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    def read(self, container_name, blob_name, etag):
+        """``(memoryview, entry)`` for a fresh mirrored copy of ``etag``, else None."""
+        manifest = self._manifest(container_name)
+        entry = manifest["blobs"].get(blob_name) if manifest else None
+        if entry is None or entry["etag"] != etag:
+            self._count("misses")
+            return None
+        if time.time() - entry["checked_at"] > self.max_staleness:
+            self._count("stale")
+            return None
+
+        view = self._view(entry["digest"])
+        if view is None or len(view) != entry["size"]:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return view, entry
+
+    def _view(self, digest):
+        with self._lock:
+            view = self._views.get(digest)
+            if view is not None:
+                self._views.move_to_end(digest)
+                return view
+        try:
+            with open(self._object_path(digest), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)) if size else memoryview(b"")
+        except OSError:
+            return None
+        with self._lock:
+            self._views[digest] = view
+            # Dropped, not closed: a reader may still hold a slice of it
+            while len(self._views) > self.max_open:
+                self._views.popitem(last=False)
+        return view
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, open_objects=len(self._views))
+
+    def client(self, container_name, container_client, expected_etag):
+        return MirroredContainerClient(self, container_name, container_client, expected_etag)
+
+    # -----------------------------
+    # Sync
+    # -----------------------------
+    def sync(self, container_name, container_client, workers=SYNC_WORKERS):
+        """Mirror one container; returns counts of downloaded, removed and unchanged blobs."""
+        with self._sync_lock:
+            manifest = self._load_manifest(container_name)
+            blobs = manifest["blobs"]
+            started = time.time()
+            listed = {blob.name: blob for blob in container_client.list_blobs()}
+
+            changed = [
+                name for name, blob in listed.items()
+                if blobs.get(name, {}).get("etag") != blob.etag
+                or not os.path.exists(self._object_path(blobs[name]["digest"]))
+            ]
+
+            def fetch(name):
+                try:
+                    downloader = container_client.download_blob(name)
+                    data = downloader.readall()
+                    digest = self._write_object(data)
+                except Exception as e:
+                    print(f"Mirror sync of {container_name}/{name} failed: {e}")
+                    return name, None
+                modified = getattr(downloader.properties, "last_modified", None)
+                return name, {
+                    "etag": downloader.properties.etag,
+                    "digest": digest,
+                    "size": len(data),
+                    "last_modified": modified.isoformat() if hasattr(modified, "isoformat") else modified,
+                    "checked_at": started,
+                }
+
+            downloaded = 0
+            with ThreadPoolExecutor(max(1, workers), thread_name_prefix="mirror-sync") as pool:
+                for name, entry in pool.map(fetch, changed):
+                    if entry is None:
+                        blobs.pop(name, None)   # unknown state: let reads go to Azure
+                    else:
+                        blobs[name] = entry
+                        downloaded += 1
+
+            for name in listed:
+                if name in blobs and name not in changed:
+                    blobs[name]["checked_at"] = started
+            removed = [name for name in blobs if name not in listed]
+            for name in removed:
+                del blobs[name]
+
+            manifest["synced_at"] = started
+            self._save_manifest(container_name, manifest)
+            with self._lock:
+                self._loaded.pop(container_name, None)
+
+            return {
+                "downloaded": downloaded,
+                "failed": len(changed) - downloaded,
+                "removed": len(removed),
+                "unchanged": len(listed) - len(changed),
+            }
+
+    def _write_object(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def gc(self):
+        """Delete objects no manifest refers to; returns how many."""
+        manifests_dir = os.path.join(self.root, "manifests")
+        referenced = set()
+        for filename in os.listdir(manifests_dir) if os.path.isdir(manifests_dir) else []:
+            if filename.endswith(".json"):
+                manifest = self._load_manifest(filename[:-len(".json")])
+                referenced.update(entry["digest"] for entry in manifest["blobs"].values())
+
+        removed = 0
+        cutoff = time.time() - GC_GRACE_SECONDS
+        objects_dir = os.path.join(self.root, "objects")
+        for dirpath, _, filenames in os.walk(objects_dir):
+            for filename in filenames:
+                digest = os.path.basename(dirpath) + filename
+                path = os.path.join(dirpath, filename)
+                if digest in referenced or os.path.getmtime(path) > cutoff:
+                    continue
+                os.remove(path)
+                removed += 1
+        return removed
+
+    def sync_all(self, container_clients):
+        """``container_clients`` maps container name -> client."""
+        results = {name: self.sync(name, client) for name, client in container_clients.items()}
+        self.gc()
+        return results
+
+    def start_background_sync(self, container_factories, interval=SYNC_INTERVAL):
+        """Re-sync every ``interval`` seconds; factories map container name -> client()."""
+        def loop():
+            while True:
+                try:
+                    self.sync_all({name: factory() for name, factory in container_factories.items()})
+                except Exception as e:
+                    print(f"Mirror sync failed: {e}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=loop, name="mirror-sync-loop", daemon=True)
+        thread.start()
+        return thread
+
+
+def from_env():
+    return BlobMirror(MIRROR_DIR) if MIRROR_DIR else None
+
+
+# -----------------------------
+# Sync command
+# -----------------------------
+def main(argv):
+    if len(argv) < 2 or argv[1] != "sync" or not MIRROR_DIR:
+        print(f"Usage: BLOB_MIRROR_DIR=<dir> {argv[0]} sync [layer ...]", file=sys.stderr)
+        return 1
+
+    import blob_clients
+    import handlers
+
+    layers = argv[2:] or list(handlers.CONTAINERS)
+    unknown = [layer for layer in layers if layer not in handlers.CONTAINERS]
+    if unknown:
+        print(f"Unknown layers: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+
+    blob_clients.init_blob_clients(handlers.AZURE_CONNECTION_STRING, handlers.CONTAINERS)
+    mirror = BlobMirror(MIRROR_DIR)
+    results = mirror.sync_all({
+        handlers.CONTAINERS[layer]: blob_clients.get_container_client(layer) for layer in layers
+    })
+    for container_name, counts in results.items():
+        print(f"{container_name}: {counts['downloaded']} downloaded, {counts['failed']} failed, "
+              f"{counts['removed']} removed, {counts['unchanged']} unchanged")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
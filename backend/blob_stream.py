@@ -0,0 +1,120 @@
+# blob_stream.py
+"""Range-read download path for large encrypted records.
+
+Instead of ``download_blob().readall()``, a record is read as:
+
+    1. the salt|iv header and the trailing GCM tag (two small range reads),
+    2. the ciphertext in BLOB_STREAM_CHUNK-sized ranges, up to
+       BLOB_STREAM_PARALLEL requests in flight,
+
+and each chunk goes through aes_engine.StreamDecryptor into a RecordParser
+as soon as it arrives, in order. The ciphertext range requests start before
+the key is derived, so PBKDF2 overlaps the first downloads. Buffered
+ciphertext per request never exceeds BLOB_STREAM_MEMORY_CAP, and the parsed
+record is only returned once the tag has verified.
+"""
+import contextvars
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from azure.core import MatchConditions
+
+import metrics
+from aes_engine import HEADER_SIZE, TAG_SIZE, DecryptionError, StreamDecryptor
+
+# Records at least this large take the streaming path
+STREAM_THRESHOLD = int(os.environ.get("BLOB_STREAM_THRESHOLD", str(4 * 1024 * 1024)))
+CHUNK_SIZE = int(os.environ.get("BLOB_STREAM_CHUNK", str(1024 * 1024)))
+PARALLEL = int(os.environ.get("BLOB_STREAM_PARALLEL", "4"))
+MEMORY_CAP = int(os.environ.get("BLOB_STREAM_MEMORY_CAP", str(8 * 1024 * 1024)))
+WORKERS = int(os.environ.get("BLOB_STREAM_WORKERS", "16"))
+
+_range_pool = ThreadPoolExecutor(WORKERS, thread_name_prefix="blob-range")
+
+
+def read_range(container_client, blob_name, offset, length, etag=None):
+    # Pinning the etag makes a blob replaced mid-read fail fast instead of
+    # mixing two versions (which the GCM tag would reject anyway)
+    kwargs = {"etag": etag, "match_condition": MatchConditions.IfNotModified} if etag else {}
+    return container_client.download_blob(blob_name, offset=offset, length=length, **kwargs).readall()
+
+
+class RangeReader:
+    """Reads [start, end) of a blob as ordered chunks with a bounded window.
+
+    Requests for the first window are issued on construction. At most
+    ``window`` chunks are downloading or buffered while the caller holds one
+    more, so buffered ciphertext stays within ``memory_cap``.
+    """
+
+    def __init__(self, container_client, blob_name, start, end, etag=None, layer=None,
+                 chunk_size=CHUNK_SIZE, parallel=PARALLEL, memory_cap=MEMORY_CAP, pool=None):
+        self.chunk_size = max(1, min(chunk_size, memory_cap // 2))
+        self.window = max(1, min(parallel, memory_cap // self.chunk_size - 1))
+        self._container_client = container_client
+        self._blob_name = blob_name
+        self._etag = etag
+        self._layer = layer
+        self._pool = pool or _range_pool
+        self._context = contextvars.copy_context()
+        self._offsets = iter(range(start, end, self.chunk_size))
+        self._end = end
+        self._pending = deque()
+        for _ in range(self.window):
+            if not self._submit_next():
+                break
+
+    def _submit_next(self):
+        offset = next(self._offsets, None)
+        if offset is None:
+            return False
+        length = min(self.chunk_size, self._end - offset)
+        self._pending.append(self._pool.submit(
+            self._context.copy().run, read_range,
+            self._container_client, self._blob_name, offset, length, self._etag,
+        ))
+        return True
+
+    def __iter__(self):
+        try:
+            while self._pending:
+                chunk = self._pending.popleft().result()
+                metrics.record_download(self._layer, len(chunk))
+                self._submit_next()
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        while self._pending:
+            self._pending.popleft().cancel()
+
+
+def fetch_record(container_client, blob_name, size, password, schema, etag=None, layer=None,
+                 chunk_size=CHUNK_SIZE, parallel=PARALLEL, memory_cap=MEMORY_CAP):
+    """Download, decrypt and parse one record by range reads; returns the parsed record.
+
+    Raises DecryptionError if the record is truncated or fails authentication.
+    """
+    if size < HEADER_SIZE + TAG_SIZE:
+        raise DecryptionError("Encrypted record is truncated")
+
+    context = contextvars.copy_context()
+    header = _range_pool.submit(context.copy().run, read_range, container_client, blob_name, 0, HEADER_SIZE, etag)
+    tag = _range_pool.submit(context.copy().run, read_range, container_client, blob_name, size - TAG_SIZE, TAG_SIZE, etag)
+    body = RangeReader(container_client, blob_name, HEADER_SIZE, size - TAG_SIZE, etag=etag, layer=layer,
+                       chunk_size=chunk_size, parallel=parallel, memory_cap=memory_cap)
+    try:
+        header, tag = header.result(), tag.result()
+        metrics.record_download(layer, len(header) + len(tag))
+        decryptor = StreamDecryptor(password, header, tag)
+
+        parser = schema.parser()
+        for chunk in body:
+            parser.feed(decryptor.update(chunk))
+        # Raises on a bad tag; the partly parsed record is dropped with the parser
+        parser.feed(decryptor.finalize())
+        return parser.close()
+    finally:
+        body.close()
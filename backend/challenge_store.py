@@ -0,0 +1,133 @@
+# challenge_store.py
+"""Expiring, single-use storage for login challenges.
+
+Challenges are keyed by their own value, so concurrent get_challenge calls
+for the same user no longer overwrite each other, and consume() removes a
+challenge atomically so it can be used at most once. Two backends:
+
+    MemoryChallengeStore -- one process
+    SQLiteChallengeStore -- shared by every worker on the host
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from expiring_store import SQLiteTable, purge_expired
+
+CHALLENGE_TTL = float(os.environ.get("CHALLENGE_TTL", "120"))
+CHALLENGE_MAX = int(os.environ.get("CHALLENGE_MAX", "10000"))
+CHALLENGE_DB = os.environ.get(
+    "CHALLENGE_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".challenges.sqlite3"),
+)
+CHALLENGE_SIZE = 16
+
+
+class MemoryChallengeStore:
+    def __init__(self, ttl=CHALLENGE_TTL, max_entries=CHALLENGE_MAX):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # challenge hex -> (username, expires_at), oldest first
+
+    def issue(self, username):
+        challenge = os.urandom(CHALLENGE_SIZE)
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            self._entries[challenge.hex()] = (username, now + self.ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return challenge
+
+    def consume(self, username, challenge_hex=None):
+        """Remove and return a live challenge for ``username``, or None.
+
+        Without ``challenge_hex`` the user's most recent challenge is used.
+        """
+        now = time.time()
+        with self._lock:
+            if challenge_hex is None:
+                for key in reversed(self._entries):
+                    if self._entries[key][0] == username:
+                        challenge_hex = key
+                        break
+                else:
+                    return None
+
+            # Another user's challenge is left alone, so naming the wrong
+            # user cannot burn it
+            entry = self._entries.get(challenge_hex)
+            if entry is None or entry[0] != username:
+                return None
+            del self._entries[challenge_hex]
+            if entry[1] <= now:
+                return None
+            return bytes.fromhex(challenge_hex)
+
+    def __len__(self):
+        with self._lock:
+            self._purge(time.time())
+            return len(self._entries)
+
+    def _purge(self, now):
+        purge_expired(self._entries, now, lambda entry: entry[1])
+
+
+class SQLiteChallengeStore:
+    def __init__(self, path=CHALLENGE_DB, ttl=CHALLENGE_TTL, max_entries=CHALLENGE_MAX):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._table = SQLiteTable(path, "challenges", "challenge", "created_at", (
+            "CREATE TABLE IF NOT EXISTS challenges ("
+            " challenge TEXT PRIMARY KEY,"
+            " username TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " created_at REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS challenges_user ON challenges (username, created_at)",
+        ))
+
+    def issue(self, username):
+        challenge = os.urandom(CHALLENGE_SIZE)
+        now = time.time()
+        self._table.insert(
+            {"challenge": challenge.hex(), "username": username, "expires_at": now + self.ttl, "created_at": now},
+            now, self.max_entries,
+        )
+        return challenge
+
+    def consume(self, username, challenge_hex=None):
+        now = time.time()
+        conn = self._table.connect()
+        if challenge_hex is None:
+            row = conn.execute(
+                "SELECT challenge FROM challenges WHERE username = ? AND expires_at > ?"
+                " ORDER BY created_at DESC LIMIT 1",
+                (username, now),
+            ).fetchone()
+            if row is None:
+                return None
+            challenge_hex = row[0]
+
+        # A single DELETE is atomic across processes: only one caller gets rowcount 1
+        cursor = conn.execute(
+            "DELETE FROM challenges WHERE challenge = ? AND username = ? AND expires_at > ?",
+            (challenge_hex, username, now),
+        )
+        if cursor.rowcount != 1:
+            return None
+        return bytes.fromhex(challenge_hex)
+
+    def __len__(self):
+        return self._table.live_count(time.time())
+
+
+def from_env():
+    backend = os.environ.get("CHALLENGE_STORE", "memory")
+    if backend == "sqlite":
+        return SQLiteChallengeStore()
+    if backend != "memory":
+        raise ValueError(f"Unknown CHALLENGE_STORE {backend!r} (use memory or sqlite)")
+    return MemoryChallengeStore()
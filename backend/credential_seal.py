@@ -0,0 +1,42 @@
+# credential_seal.py
+"""Per-process credential fingerprints and sealing keys.
+
+record_cache.py and billing_store.py keep parsed records in memory on behalf
+of the password that decrypted them. Both key their state by a fingerprint
+of that password and seal the records with AES-GCM under a key derived from
+it, so a caller with a different password can neither find nor open them.
+The secret is per process: fingerprints and keys are useless outside it.
+"""
+import hashlib
+import hmac
+import json
+import os
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+NONCE_SIZE = 12
+
+
+class CredentialSeal:
+    def __init__(self, secret=None):
+        self._secret = secret or os.urandom(32)
+
+    def fingerprint(self, password):
+        return hmac.new(self._secret, b"fingerprint|" + password.encode(), hashlib.sha256).hexdigest()
+
+    def sealing_key(self, password):
+        return hmac.new(self._secret, b"seal|" + password.encode(), hashlib.sha256).digest()
+
+    def aead(self, password):
+        return AESGCM(self.sealing_key(password))
+
+
+def seal(aead, value):
+    """JSON-encode ``value`` and seal it as nonce|ciphertext."""
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + aead.encrypt(nonce, json.dumps(value).encode(), None)
+
+
+def unseal(aead, sealed):
+    """Inverse of seal(); raises cryptography's InvalidTag for another key."""
+    return json.loads(aead.decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], None))
@@ -0,0 +1,75 @@
+# expiring_store.py
+"""Storage shared by the login challenge and session stores.
+
+Both keep bounded sets of entries that share one TTL, either in an
+OrderedDict in issue order (one process) or in an SQLite table (every
+worker on the host).
+"""
+import sqlite3
+import threading
+
+
+def purge_expired(entries, now, expires_at):
+    """Drop expired entries from the front of ``entries``, an OrderedDict in
+    issue order; ``expires_at(value)`` gives an entry's expiry. Returns the
+    number dropped. Caller holds the store's lock."""
+    purged = 0
+    while entries:
+        key = next(iter(entries))
+        if expires_at(entries[key]) > now:
+            break
+        del entries[key]
+        purged += 1
+    return purged
+
+
+class SQLiteTable:
+    """An SQLite table of entries with an ``expires_at`` column, opened with
+    one connection per thread. ``order_column`` sorts newest rows last."""
+
+    def __init__(self, path, table, key_column, order_column, schema):
+        self.path = path
+        self.table = table
+        self.key_column = key_column
+        self.order_column = order_column
+        self._local = threading.local()
+        with self.connect() as conn:
+            for statement in schema:
+                conn.execute(statement)
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def insert(self, row, now, max_rows):
+        """Insert ``row`` (column -> value), dropping expired rows and the
+        oldest beyond ``max_rows`` in the same transaction. Returns the
+        number of expired rows dropped."""
+        columns = ", ".join(row)
+        placeholders = ", ".join("?" for _ in row)
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            purged = conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,)).rowcount
+            conn.execute(f"INSERT INTO {self.table} ({columns}) VALUES ({placeholders})", tuple(row.values()))
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE {self.key_column} IN ("
+                f" SELECT {self.key_column} FROM {self.table} ORDER BY {self.order_column} DESC LIMIT -1 OFFSET ?)",
+                (max_rows,),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return purged
+
+    def live_count(self, now):
+        row = self.connect().execute(
+            f"SELECT COUNT(*) FROM {self.table} WHERE expires_at > ?", (now,)
+        ).fetchone()
+        return row[0]
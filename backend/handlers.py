@@ -0,0 +1,754 @@
+# handlers.py
+"""Framework-independent implementation of the /api/* endpoints.
+
+server.py (Flask) and asgi_app.py (FastAPI/uvicorn) are thin route layers
+over the functions here. Every api_* function takes the decoded JSON body
+and returns ``(payload, status, headers)``.
+"""
+import contextvars
+import functools
+import hashlib
+import hmac
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from azure.core.exceptions import ResourceModifiedError
+from azure.identity import DefaultAzureCredential
+from azure.keyvault.secrets import SecretClient
+
+import admission
+import blob_clients
+import blob_mirror
+import blob_stream
+import challenge_store
+import metrics
+import prefetch
+import record_parser
+import record_pipeline
+import scratch
+import sessions
+import singleflight
+from aes_engine import DecryptionError, decrypt_bytes, key_cache
+from billing_store import BillingSummaryStore
+from blob_index import BlobIndex, normalize_patient_id
+from record_cache import RecordCache
+from secret_provider import CachedSecretProvider, KeyVaultSecretSource, LocalSecretSource
+
+CONTAINERS = {"A": "layer-a", "B": "layer-b", "C": "layer-c"}
+AZURE_CONNECTION_STRING = os.environ.get("AZURE_STORAGE_CONNECTION_STRING")
+
+AES_EXE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "aes_gcm.exe")
+# "native" decrypts in-process; "exe" keeps the old aes_gcm.exe subprocess path
+AES_BACKEND = os.environ.get("AES_BACKEND", "native")
+
+# -----------------------------
+# Azure Key Vault setup
+# -----------------------------
+KV_URI = "https://healthcarekv12345.vault.azure.net/"
+credential = DefaultAzureCredential()
+client = SecretClient(vault_url=KV_URI, credential=credential)
+
+# KMASTER_LOCAL swaps Key Vault for a local stand-in (offline runs and tests)
+if os.environ.get("KMASTER_LOCAL"):
+    kmaster_source = LocalSecretSource({"KmasterSecret": os.environ["KMASTER_LOCAL"]})
+else:
+    kmaster_source = KeyVaultSecretSource(client)
+KMASTER_PROVIDER = CachedSecretProvider(kmaster_source, "KmasterSecret")
+
+def get_kmaster():
+    with metrics.span("get_kmaster"):
+        return KMASTER_PROVIDER.get().encode()
+
+# -----------------------------
+# Passwords and System IDs
+# -----------------------------
+PASSWORDS = {
+    "FrontDesk": "FrontDesk@2025!",
+    "GP": "GP_Doctor#Secure1",
+    "CARDIO": "Cardio@Heart2025",
+    "ORTHO": "Ortho@BoneSafe",
+    "BillingDesk": "Billing$Vault2025"
+}
+
+SYSTEM_IDS = {
+    "FrontDesk": "05440fb4ae6a44b5ad628db72b68c2df",  # machine-id from your system
+    "GP": "05440fb4ae6a44b5ad628db72b68c2df",
+    "CARDIO": "05440fb4ae6a44b5ad628db72b68c2df",
+    "ORTHO": "05440fb4ae6a44b5ad628db72b68c2df",
+    "BillingDesk": "05440fb4ae6a44b5ad628db72b68c2df"
+}
+
+# Expiring single-use login challenges; CHALLENGE_STORE=sqlite shares them
+# between worker processes
+CHALLENGES = challenge_store.from_env()
+
+# Sessions issued by verify_login; fetches send the token, not the password
+SESSIONS = sessions.from_env()
+
+def with_session(handler):
+    """Let a fetch endpoint authenticate with ``token`` instead of ``password``.
+
+    The token's session supplies the password, and its cache of derived AES
+    keys is used for every decrypt the request makes (worker pools inherit
+    it with the request context). Requests without a token keep sending
+    the password, as older clients do.
+    """
+    @functools.wraps(handler)
+    def wrapper(data):
+        token = data.get("token")
+        if not token:
+            return handler(data)
+        session = SESSIONS.resolve(token)
+        if session is None:
+            return {"error": "Invalid or expired session"}, 401, {}
+        with key_cache(session.keys):
+            return handler(dict(data, password=session.password))
+    return wrapper
+
+# -----------------------------
+# Admission control
+# -----------------------------
+# Concurrency limits and bounded queues per priority class, so bulk billing
+# scans cannot starve clinical lookups (see admission.py)
+ADMISSION = admission.Scheduler.from_env()
+
+def scheduled(priority):
+    """Run an endpoint under ADMISSION in ``priority``'s class.
+
+    A shed request gets a 503 with Retry-After. A streamed payload keeps
+    its slot until the stream is finished.
+    """
+    def decorate(handler):
+        endpoint = handler.__name__[len("api_"):]
+        ADMISSION.register(endpoint, priority)
+
+        @functools.wraps(handler)
+        def wrapper(data):
+            try:
+                ticket = ADMISSION.acquire(endpoint)
+            except admission.Rejected as e:
+                return busy_response(e)
+            try:
+                payload, status, headers = handler(data)
+            except BaseException:
+                ADMISSION.release(ticket)
+                raise
+            if status == 200 and hasattr(payload, "__next__"):
+                return admission.ReleasingIterator(payload, ADMISSION, ticket), status, headers
+            ADMISSION.release(ticket)
+            return payload, status, headers
+        wrapper.admission_endpoint = endpoint
+        return wrapper
+    return decorate
+
+def busy_response(rejected):
+    return (
+        {"error": "Server busy, please retry", "reason": rejected.reason},
+        503,
+        {"Retry-After": str(rejected.retry_after)},
+    )
+
+# -----------------------------
+# Blob storage and patient index
+# -----------------------------
+# Optional local ciphertext mirror (BLOB_MIRROR_DIR); downloads try it first
+MIRROR = blob_mirror.from_env()
+
+def get_container_client(layer):
+    if not blob_clients.is_initialised():
+        blob_clients.init_blob_clients(AZURE_CONNECTION_STRING, CONTAINERS)
+    container_client = blob_clients.get_container_client(layer)
+    if MIRROR is not None:
+        return MIRROR.client(CONTAINERS[layer], container_client, BLOB_INDEXES[layer].etag)
+    return container_client
+
+BLOB_INDEXES = {
+    layer: BlobIndex(name, lambda layer=layer: get_container_client(layer))
+    for layer, name in CONTAINERS.items()
+}
+
+def warm_blob_indexes():
+    for layer, index in BLOB_INDEXES.items():
+        try:
+            index.ensure_ready()
+        except Exception as e:
+            print(f"Blob index warm-up failed for layer {layer}: {e}")
+
+def startup():
+    if not blob_clients.is_initialised():
+        blob_clients.init_blob_clients(AZURE_CONNECTION_STRING, CONTAINERS)
+    warm_blob_indexes()
+    if MIRROR is not None and blob_mirror.SYNC_INTERVAL > 0:
+        MIRROR.start_background_sync({
+            name: (lambda layer=layer: blob_clients.get_container_client(layer))
+            for layer, name in CONTAINERS.items()
+        })
+    if PREFETCH_FILE:
+        try:
+            PREFETCHER.schedule(prefetch.load_schedule(PREFETCH_FILE))
+        except (OSError, ValueError) as e:
+            print(f"Prefetch schedule {PREFETCH_FILE} not loaded: {e}")
+
+# -----------------------------
+# Record decryption
+# -----------------------------
+def decrypt_with_exe(password, encrypted, blob_name):
+    # Private per-call workspace: no collisions between concurrent requests
+    # and nothing (ciphertext or PHI) is left on disk afterwards
+    try:
+        with scratch.workspace() as ws:
+            enc_file_path = ws.write(encrypted, suffix=".enc")
+            dec_file_path = ws.new_path(suffix=".txt")
+
+            result = subprocess.run(
+                [AES_EXE, "decrypt", password, enc_file_path, dec_file_path],
+                capture_output=True,
+                text=True
+            )
+            if result.returncode != 0:
+                raise DecryptionError(result.stderr.strip() or "Decryption failed")
+
+            return ws.read(dec_file_path)
+    except scratch.ScratchQuotaExceeded as e:
+        raise DecryptionError(f"{blob_name}: {e}") from None
+
+def decrypt_record(password, encrypted, blob_name):
+    if AES_BACKEND == "exe":
+        plaintext = decrypt_with_exe(password, encrypted, blob_name)
+    else:
+        plaintext = decrypt_bytes(password, encrypted)
+    return plaintext.decode(errors="ignore")
+
+def timed_decrypt(layer, password, encrypted, blob_name):
+    with metrics.span("decrypt"):
+        try:
+            return decrypt_record(password, encrypted, blob_name)
+        except DecryptionError:
+            metrics.DECRYPT_FAILURES.inc(layer=layer)
+            raise
+
+def billing_record_processor(password):
+    def process(blob_name, encrypted):
+        content = timed_decrypt("C", password, encrypted, blob_name)
+        with metrics.span("parse"):
+            return record_parser.BILLING.parse(content)
+    return process
+
+# -----------------------------
+# Single-patient fetch (index -> cache -> download -> decrypt -> parse)
+# -----------------------------
+RECORD_CACHE = RecordCache()
+# A cache hit may be this many seconds behind an update to its blob (0:
+# confirm the etag with a properties request on every hit). The etag counts
+# as confirmed by such a request or by an index listing within that time;
+# the index alone only refreshes on a lookup miss, so it cannot notice an
+# update by itself.
+CACHE_REVALIDATE_SECONDS = float(os.environ.get("RECORD_CACHE_REVALIDATE", "5"))
+_etag_confirmed = {}   # (layer, blob name) -> (etag, monotonic time confirmed)
+
+def current_etag(layer, blob_name, etag):
+    """The blob's etag now, confirming ``etag`` with Azure unless it was
+    confirmed recently; None if the blob cannot be read."""
+    index = BLOB_INDEXES[layer]
+    if index.refreshed_within(CACHE_REVALIDATE_SECONDS):
+        return index.etag(blob_name)
+    confirmed = _etag_confirmed.get((layer, blob_name))
+    if confirmed is not None and confirmed[0] == etag and \
+            time.monotonic() - confirmed[1] < CACHE_REVALIDATE_SECONDS:
+        return etag
+    try:
+        with metrics.span("revalidate"):
+            properties = get_container_client(layer).get_blob_client(blob_name).get_blob_properties()
+    except Exception as e:
+        print(f"ERROR checking {blob_name}: {e}")
+        return None
+    BLOB_INDEXES[layer].update_etag(blob_name, properties.etag, properties.last_modified, properties.size)
+    _etag_confirmed[(layer, blob_name)] = (properties.etag, time.monotonic())
+    return properties.etag
+
+# Concurrent fetches of the same patient with the same credential share one
+# lookup/download/decrypt
+FETCH_FLIGHTS = singleflight.Group()
+
+def fetch_patient_record(layer, patient_id, password, schema):
+    """Return the parsed record for ``patient_id`` in ``layer`` or None."""
+    key = (layer, normalize_patient_id(patient_id), FETCH_FLIGHTS.fingerprint(password))
+    record, shared = FETCH_FLIGHTS.do(key, _fetch_patient_record, layer, patient_id, password, schema)
+    # Callers may extend the record, so each gets its own copy
+    return dict(record) if shared and record else record
+
+def _fetch_patient_record(layer, patient_id, password, schema):
+    index = BLOB_INDEXES[layer]
+
+    # Exact patient ID match via the blob index (no container scan)
+    with metrics.span("index_lookup"):
+        blob_name = index.lookup(patient_id)
+    if blob_name is None:
+        return None
+
+    patient_key = normalize_patient_id(patient_id)
+    entry = index.entry(blob_name) or {}
+    etag = entry.get("etag")
+    with metrics.span("cache_lookup"):
+        cached = RECORD_CACHE.get(layer, patient_key, etag, password)
+    if cached is not None:
+        if current_etag(layer, blob_name, etag) == etag:
+            return cached
+        # Replaced since it was cached: the index now has the new etag
+        entry = index.entry(blob_name) or {}
+        etag = entry.get("etag")
+
+    size = entry.get("size") or 0
+    if AES_BACKEND != "exe" and size >= blob_stream.STREAM_THRESHOLD:
+        record, etag = fetch_large_record(layer, blob_name, size, etag, password, schema)
+    else:
+        record, etag = fetch_small_record(layer, blob_name, password, schema)
+    if record is None:
+        return None
+
+    # Only cached under this password's fingerprint, which just decrypted it
+    RECORD_CACHE.put(layer, patient_key, etag, password, record)
+    return record
+
+def fetch_small_record(layer, blob_name, password, schema):
+    """Whole-blob download; returns (record or None, etag)."""
+    try:
+        # Download and decrypt in memory
+        with metrics.span("download"):
+            downloader = get_container_client(layer).download_blob(blob_name)
+            encrypted = downloader.readall()
+        metrics.record_download(layer, len(encrypted))
+        etag = downloader.properties.etag
+        BLOB_INDEXES[layer].update_etag(blob_name, etag, downloader.properties.last_modified)
+
+        try:
+            content = timed_decrypt(layer, password, encrypted, blob_name)
+        except DecryptionError as e:
+            print(f"AES ERROR for {blob_name}: {e}")
+            return None, etag
+
+        with metrics.span("parse"):
+            return schema.parse(content), etag
+    except Exception as e:
+        print(f"ERROR processing {blob_name}: {e}")
+        return None, None
+
+def fetch_large_record(layer, blob_name, size, etag, password, schema):
+    """Range-read download streamed through decrypt and parse (blob_stream.py).
+
+    Returns (record or None, etag).
+    """
+    container_client = get_container_client(layer)
+    try:
+        with metrics.span("stream_fetch"):
+            try:
+                record = blob_stream.fetch_record(container_client, blob_name, size, password, schema,
+                                                  etag=etag, layer=layer)
+            except ResourceModifiedError:
+                # Replaced since it was indexed: pick up the new version and read it once more
+                properties = container_client.get_blob_client(blob_name).get_blob_properties()
+                etag, size = properties.etag, properties.size
+                BLOB_INDEXES[layer].update_etag(blob_name, etag, properties.last_modified)
+                record = blob_stream.fetch_record(container_client, blob_name, size, password, schema,
+                                                  etag=etag, layer=layer)
+        return record, etag
+    except DecryptionError as e:
+        metrics.DECRYPT_FAILURES.inc(layer=layer)
+        print(f"AES ERROR for {blob_name}: {e}")
+    except Exception as e:
+        print(f"ERROR processing {blob_name}: {e}")
+    return None, None
+
+# -----------------------------
+# Prefetch of scheduled patients
+# -----------------------------
+# Role -> (layer, schema) for the single-patient views worth warming; the
+# role's own password is used, as its dashboard sends it
+PREFETCH_ROLES = {
+    "GP": ("B", record_parser.CLINICAL),
+    "CARDIO": ("B", record_parser.CLINICAL),
+    "ORTHO": ("B", record_parser.CLINICAL),
+    "FrontDesk": ("A", record_parser.FRONTDESK),
+}
+PREFETCH_FILE = os.environ.get("PREFETCH_FILE")
+
+def _prefetch_warm(role, patient_id):
+    layer, schema = PREFETCH_ROLES[role]
+    if BLOB_INDEXES[layer].lookup(patient_id) is None:
+        return prefetch.MISSING
+    record = fetch_patient_record(layer, patient_id, PASSWORDS[role], schema)
+    return prefetch.HOT if record else prefetch.FAILED
+
+def _prefetch_is_hot(role, patient_id):
+    layer, _ = PREFETCH_ROLES[role]
+    index = BLOB_INDEXES[layer]
+    blob_name = index.lookup(patient_id, refresh=False)
+    if blob_name is None:
+        return False
+    etag = (index.entry(blob_name) or {}).get("etag")
+    return RECORD_CACHE.contains(layer, normalize_patient_id(patient_id), etag, PASSWORDS[role])
+
+PREFETCHER = prefetch.Prefetcher(_prefetch_warm, _prefetch_is_hot, metrics.in_flight)
+
+def api_prefetch_schedule(data):
+    """Queue ``{"schedule": {role: [patient IDs]}, "replace": true}`` for warm-up."""
+    schedule = data.get("schedule")
+    if not isinstance(schedule, dict) or not all(isinstance(ids, list) for ids in schedule.values()):
+        return {"error": "schedule must map role to a list of patient IDs"}, 400, {}
+    unknown = sorted(set(schedule) - set(PREFETCH_ROLES))
+    if unknown:
+        return {"error": f"Unknown roles: {', '.join(unknown)}"}, 400, {}
+
+    try:
+        queued = PREFETCHER.schedule(schedule, replace=data.get("replace", True))
+    except ValueError as e:
+        return {"error": str(e)}, 400, {}
+    return {"queued": queued, **PREFETCHER.coverage()}, 202, {}
+
+def api_prefetch_coverage():
+    return PREFETCHER.coverage(), 200, {}
+
+def api_cache_stats():
+    stats = dict(RECORD_CACHE.stats(), coalescing=FETCH_FLIGHTS.stats(), blob_pool=blob_clients.pool_stats())
+    if MIRROR is not None:
+        stats["mirror"] = MIRROR.stats()
+    return stats, 200, {}
+
+def api_admission_stats():
+    return ADMISSION.stats(), 200, {}
+
+def _cache_metrics():
+    stats = RECORD_CACHE.stats()
+    collected = []
+    for name in ("hits", "misses", "evictions", "expirations", "invalidations"):
+        counter = metrics.Counter(f"ehr_record_cache_{name}_total", f"Record cache {name}.")
+        counter.inc(stats[name])
+        collected.append(counter)
+    entries = metrics.Gauge("ehr_record_cache_entries", "Records held in the cache.")
+    entries.set(stats["entries"])
+    collected.append(entries)
+
+    flights = FETCH_FLIGHTS.stats()
+    executions = metrics.Counter("ehr_fetch_executions_total", "Patient fetches actually executed.")
+    executions.inc(flights["executions"])
+    coalesced = metrics.Counter("ehr_fetch_coalesced_total",
+                                "Duplicate concurrent patient fetches served by one in flight.")
+    coalesced.inc(flights["coalesced"])
+    active_sessions = metrics.Gauge("ehr_sessions_active", "Live login sessions.")
+    active_sessions.set(SESSIONS.stats()["active"])
+    collected += [executions, coalesced, active_sessions]
+
+    if MIRROR is not None:
+        mirror_stats = MIRROR.stats()
+        for name in ("hits", "misses", "stale"):
+            counter = metrics.Counter(f"ehr_blob_mirror_{name}_total", f"Blob mirror reads: {name}.")
+            counter.inc(mirror_stats[name])
+            collected.append(counter)
+    return collected
+
+metrics.REGISTRY.register_collector(_cache_metrics)
+
+def _admission_metrics():
+    stats = ADMISSION.stats()
+    queued = metrics.Gauge("ehr_admission_queue_depth", "Requests waiting for a slot.", labels=("priority",))
+    active = metrics.Gauge("ehr_admission_active", "Requests holding a slot.", labels=("priority",))
+    admitted = metrics.Counter("ehr_admission_admitted_total", "Requests admitted.", labels=("priority",))
+    shed = metrics.Counter("ehr_admission_shed_total", "Requests answered 503 instead of queued.",
+                           labels=("priority", "reason"))
+    for priority, klass in stats["classes"].items():
+        queued.set(klass["queued"], priority=priority)
+        active.set(klass["active"], priority=priority)
+        admitted.inc(klass["admitted"], priority=priority)
+        shed.inc(klass["shed_queue_full"], priority=priority, reason="queue_full")
+        shed.inc(klass["shed_deadline"], priority=priority, reason="deadline")
+    return [queued, active, admitted, shed]
+
+metrics.REGISTRY.register_collector(_admission_metrics)
+
+def api_metrics():
+    """Prometheus text format; the payload is a str."""
+    return metrics.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
+# -----------------------------
+# Fetch system ID automatically from WSL Ubuntu
+# -----------------------------
+def get_system_id():
+    try:
+        with open("/etc/machine-id") as f:
+            return f.read().strip()
+    except Exception as e:
+        print("Error fetching system ID:", e)
+        return "UNKNOWN_SYS"
+
+def api_get_system_id():
+    return {"system_id": get_system_id()}, 200, {}
+
+# -----------------------------
+# Generate challenge
+# -----------------------------
+def api_get_challenge(data):
+    username = data.get("username")
+    if username not in PASSWORDS:
+        return {"error": "Unknown username"}, 404, {}
+
+    challenge = CHALLENGES.issue(username)
+    return {"challenge": challenge.hex()}, 200, {}
+
+# -----------------------------
+# Verify login
+# -----------------------------
+def api_verify_login(data):
+    username = data.get("username")
+    password = data.get("password")
+    system_id = data.get("system_id")
+
+    challenge_hex = data.get("challenge")
+    if not all(value is None or isinstance(value, str) for value in (username, challenge_hex)):
+        return {"error": "username and challenge must be strings"}, 400, {}
+
+    if username not in PASSWORDS:
+        return {"error": "Unknown username"}, 404, {}
+
+    # Single use: the challenge is spent whether or not this attempt succeeds
+    challenge = CHALLENGES.consume(username, challenge_hex)
+    if not challenge:
+        return {"error": "No active challenge"}, 400, {}
+
+    expected_password = PASSWORDS[username]
+    expected_system_id = SYSTEM_IDS[username]
+
+    # Verify password & system ID
+    if expected_password != password:
+        return {"error": "Invalid password"}, 403, {}
+
+    if expected_system_id != system_id:
+        return {"error": "Invalid system/device"}, 403, {}
+
+    # -----------------------------
+    # Compute HMACs using Kmaster
+    # -----------------------------
+    Kmaster = get_kmaster()
+
+    # Simulated client HMAC (backend calculates it)
+    client_hmac = hmac.new(Kmaster, f"{username}|{system_id}|{password}|{challenge.hex()}".encode(), hashlib.sha256).hexdigest()
+
+    # Expected HMAC
+    expected_hmac = hmac.new(Kmaster, f"{username}|{expected_system_id}|{expected_password}|{challenge.hex()}".encode(), hashlib.sha256).hexdigest()
+
+    # Compare
+    if hmac.compare_digest(client_hmac, expected_hmac):
+        token, expires_at = SESSIONS.create(username, password)
+        return {
+            "status": "success",
+            "msg": f"Login successful for {username}",
+            "token": token,
+            "expiresAt": expires_at,
+        }, 200, {}
+    else:
+        return {"error": "Invalid HMAC"}, 403, {}
+
+def api_logout(data):
+    SESSIONS.revoke(data.get("token"))
+    return {"status": "success"}, 200, {}
+
+# -----------------------------
+# Single-patient endpoints
+# -----------------------------
+@scheduled("clinical")
+@with_session
+def api_fetch_clinical_data(data):
+    """GP, Cardio and Ortho views all read layer B."""
+    patient_id = data.get("patientId")  # numeric
+    password = data.get("password")
+
+    if patient_id is None or password is None:
+        return {"error": "Patient ID and password required"}, 400, {}
+
+    fields = fetch_patient_record("B", patient_id, password, record_parser.CLINICAL)
+    if not fields:
+        return {"error": "No records found or decryption failed"}, 404, {}
+
+    patient_data = {"id": patient_id, "name": f"Patient {patient_id}", **fields}
+    return patient_data, 200, {}
+
+@scheduled("frontdesk")
+@with_session
+def api_fetch_frontdesk_data(data):
+    patient_id = data.get("patientId")
+    password = data.get("password")
+
+    if not patient_id or not password:
+        return {"error": "Patient ID and password required"}, 400, {}
+
+    patient_data = fetch_patient_record("A", patient_id, password, record_parser.FRONTDESK)
+    if not patient_data:
+        return {"error": "No records found or decryption failed"}, 404, {}
+
+    return patient_data, 200, {}
+
+# -----------------------------
+# Batch fetch (ward lists, referral queues)
+# -----------------------------
+BATCH_MAX_IDS = int(os.environ.get("BATCH_MAX_IDS", "200"))
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "16"))
+_batch_pool = ThreadPoolExecutor(BATCH_WORKERS, thread_name_prefix="batch-fetch")
+
+@scheduled("bulk")
+@with_session
+def api_fetch_batch_data(data):
+    """Fetch many patients from one layer; results and errors keyed by ID."""
+    layer = data.get("layer")
+    patient_ids = data.get("patientIds")
+    password = data.get("password")
+
+    if layer not in ("A", "B") or not isinstance(patient_ids, list) or not password:
+        return {"error": "layer (A or B), patientIds list and password required"}, 400, {}
+    if len(patient_ids) > BATCH_MAX_IDS:
+        return {"error": f"At most {BATCH_MAX_IDS} patient IDs per batch"}, 400, {}
+
+    schema = record_parser.SCHEMAS[layer]
+    index = BLOB_INDEXES[layer]
+
+    def fetch_one(patient_id):
+        # All IDs resolve against the same index; misses share one throttled refresh
+        if index.lookup(patient_id) is None:
+            return patient_id, None, "No records found"
+        record = fetch_patient_record(layer, patient_id, password, schema)
+        if not record:
+            return patient_id, None, "Decryption failed"
+        if layer == "B":
+            record = {"id": patient_id, "name": f"Patient {patient_id}", **record}
+        return patient_id, record, None
+
+    unique_ids = {}
+    for patient_id in patient_ids:
+        unique_ids.setdefault(str(patient_id), patient_id)
+
+    results = {}
+    errors = {}
+    # Run each fetch in a copy of this request's context so its spans count here
+    context = contextvars.copy_context()
+    fetches = [_batch_pool.submit(context.copy().run, fetch_one, patient_id) for patient_id in unique_ids.values()]
+    for patient_id, record, error in (f.result() for f in fetches):
+        if error is None:
+            results[str(patient_id)] = record
+        else:
+            errors[str(patient_id)] = {"error": error}
+
+    return {"results": results, "errors": errors}, 200, {}
+
+# -----------------------------
+# Billing
+# -----------------------------
+BILLING_PAGE_SIZE = int(os.environ.get("BILLING_PAGE_SIZE", "100"))
+BILLING_MAX_PAGE_SIZE = 1000
+
+# Parsed billing records and per-status totals, kept current by etag so a
+# refresh only decrypts blobs added or changed since the last one
+BILLING_STORE = BillingSummaryStore(BLOB_INDEXES["C"], lambda: get_container_client("C"), billing_record_processor)
+
+@scheduled("bulk")
+@with_session
+def api_fetch_billingdesk_data(data):
+    password = data.get("password")
+    if not password:
+        return {"error": "Password required"}, 400, {}
+
+    all_patients, failures = BILLING_STORE.records(password)
+
+    if not all_patients:
+        return {"error": "No records found or decryption failed", "failures": failures}, 404, {}
+
+    headers = {"X-Failed-Records": str(len(failures))}
+    if data.get("includeErrors"):
+        return {"records": all_patients, "failures": failures}, 200, headers
+    return all_patients, 200, headers
+
+@scheduled("bulk")
+@with_session
+def api_fetch_billingdesk_summary(data):
+    """Totals by Payment_status; ``includeRecords`` adds the records themselves."""
+    password = data.get("password")
+    if not password:
+        return {"error": "Password required"}, 400, {}
+
+    summary = BILLING_STORE.summary(password)
+    if not summary["count"]:
+        return {"error": "No records found or decryption failed", "summary": summary}, 404, {}
+
+    if data.get("includeRecords"):
+        records, _ = BILLING_STORE.records(password)
+        return {"summary": summary, "records": records}, 200, {}
+    return {"summary": summary}, 200, {}
+
+@scheduled("bulk")
+@with_session
+def api_fetch_billingdesk_stream(data):
+    """On success the payload is an iterator of NDJSON lines.
+
+    Records are decrypted only as the client reads them: a slow reader holds
+    at most record_pipeline.MAX_IN_FLIGHT of them in memory.
+    """
+    password = data.get("password")
+    if not password:
+        return {"error": "Password required"}, 400, {}
+
+    container_client = get_container_client("C")
+
+    process = billing_record_processor(password)
+
+    # One NDJSON line per record as soon as it is decrypted, then a summary line
+    def generate():
+        count = failed = 0
+        for result in record_pipeline.iter_records(container_client, container_client.list_blobs(), process, layer="C"):
+            if result.error is not None:
+                failed += 1
+                yield json.dumps({"failure": {"blob": result.blob_name, "error": result.error}}) + "\n"
+            else:
+                count += 1
+                yield json.dumps({"record": result.record}) + "\n"
+        yield json.dumps({"done": True, "count": count, "failed": failed}) + "\n"
+
+    return generate(), 200, {"Content-Type": "application/x-ndjson"}
+
+@scheduled("bulk")
+@with_session
+def api_fetch_billingdesk_page(data):
+    password = data.get("password")
+    if not password:
+        return {"error": "Password required"}, 400, {}
+
+    try:
+        page_size = min(int(data.get("pageSize") or BILLING_PAGE_SIZE), BILLING_MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return {"error": "pageSize must be a number"}, 400, {}
+    if page_size <= 0:
+        return {"error": "pageSize must be positive"}, 400, {}
+
+    container_client = get_container_client("C")
+
+    # The blob listing's own paging provides the continuation token
+    pages = container_client.list_blobs(results_per_page=page_size).by_page(
+        continuation_token=data.get("continuationToken") or None
+    )
+    page = list(next(pages, []))
+
+    process = billing_record_processor(password)
+
+    records = []
+    failures = []
+    for result in record_pipeline.iter_records(container_client, page, process, layer="C"):
+        if result.error is not None:
+            print(f"ERROR processing {result.blob_name}: {result.error}")
+            failures.append(result)
+        else:
+            records.append(result)
+
+    return {
+        "records": [r.record for r in sorted(records, key=lambda r: r.index)],
+        "failures": [{"blob": r.blob_name, "error": r.error} for r in sorted(failures, key=lambda r: r.index)],
+        "continuationToken": pages.continuation_token,
+    }, 200, {}
@@ -0,0 +1,224 @@
+# metrics.py
+"""Low-overhead request metrics with Prometheus text exposition.
+
+Handlers wrap each stage (listing, download, decrypt, parse, ...) in
+``span(stage)``. Every span feeds the ehr_stage_seconds histogram and, when
+the code runs inside a request scope, that request's per-stage totals, which
+can be emitted as one structured log line per request
+(METRICS_REQUEST_LOG=1). A span costs two perf_counter() calls and a short
+locked bucket update.
+"""
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+REQUEST_LOG = os.environ.get("METRICS_REQUEST_LOG", "") not in ("", "0", "false")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(n, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for n, v in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}   # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labels + ("le",), key + (le,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            base = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{base} {series[-1]}")
+            lines.append(f"{self.name}_count{base} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collect):
+        """``collect()`` returns extra metrics (e.g. Gauges) refreshed at scrape time."""
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            for metric in collect():
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    "ehr_requests_total", "API requests by endpoint and status.", ("endpoint", "status")))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "ehr_request_seconds", "API request latency.", ("endpoint",)))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "ehr_stage_seconds", "Time spent per request stage.", ("stage",)))
+BYTES_DOWNLOADED = REGISTRY.register(Counter(
+    "ehr_blob_bytes_downloaded_total", "Encrypted bytes downloaded from blob storage.", ("layer",)))
+DECRYPT_FAILURES = REGISTRY.register(Counter(
+    "ehr_decrypt_failures_total", "Records that failed to decrypt.", ("layer",)))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "ehr_requests_in_flight", "API requests currently being served."))
+
+
+# -----------------------------
+# Request scope and spans
+# -----------------------------
+class RequestScope:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.bytes = 0
+
+    def add_stage(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_bytes(self, count):
+        with self._lock:
+            self.bytes += count
+
+
+_current = contextvars.ContextVar("ehr_request_scope", default=None)
+
+
+def start_request(endpoint):
+    """Open a request scope; pass the returned token to finish_request()."""
+    IN_FLIGHT.inc()
+    return _current.set(RequestScope(endpoint))
+
+
+def finish_request(token, status):
+    scope = _current.get()
+    _current.reset(token)
+    IN_FLIGHT.inc(-1)
+    if scope is None:
+        return
+    elapsed = time.perf_counter() - scope.started
+    REQUESTS.inc(endpoint=scope.endpoint, status=str(status))
+    REQUEST_SECONDS.observe(elapsed, endpoint=scope.endpoint)
+    if REQUEST_LOG:
+        print(json.dumps({
+            "event": "request",
+            "endpoint": scope.endpoint,
+            "status": status,
+            "duration_ms": round(elapsed * 1000, 3),
+            "stages_ms": {k: round(v * 1000, 3) for k, v in scope.stages.items()},
+            "bytes_downloaded": scope.bytes,
+        }))
+
+
+@contextmanager
+def span(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        scope = _current.get()
+        if scope is not None:
+            scope.add_stage(stage, elapsed)
+
+
+def record_download(layer, count):
+    BYTES_DOWNLOADED.inc(count, layer=layer)
+    scope = _current.get()
+    if scope is not None:
+        scope.add_bytes(count)
+
+
+def in_flight():
+    """Number of API requests currently inside a request scope."""
+    return IN_FLIGHT.value()
+
+
+def render():
+    return REGISTRY.render()
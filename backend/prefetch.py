@@ -0,0 +1,170 @@
+# prefetch.py
+"""Background warm-up of scheduled patients.
+
+A schedule maps a role (GP, CARDIO, ...) to the patient IDs it is expected
+to open, e.g. today's clinic list. The Prefetcher pushes each one through the
+normal fetch path so the blob index and record cache are hot before the
+first interactive open. It runs on a few low-priority threads, rate-limited
+(PREFETCH_RATE fetches/s) and paused while more than PREFETCH_MAX_BUSY API
+requests are in flight, so it only uses spare capacity.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", "2"))
+PREFETCH_RATE = float(os.environ.get("PREFETCH_RATE", "5"))
+PREFETCH_MAX_BUSY = int(os.environ.get("PREFETCH_MAX_BUSY", "2"))
+PREFETCH_MAX_IDS = int(os.environ.get("PREFETCH_MAX_IDS", "5000"))
+PREFETCH_NICE = int(os.environ.get("PREFETCH_NICE", "10"))
+BUSY_POLL_SECONDS = 0.05
+
+PENDING = "pending"
+HOT = "hot"
+MISSING = "missing"
+FAILED = "failed"
+
+
+def _lower_priority():
+    # Linux applies nice values per thread; elsewhere this is a no-op
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), PREFETCH_NICE)
+    except (AttributeError, OSError):
+        pass
+
+
+class RateLimiter:
+    """Token bucket; acquire() blocks until a token is free."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class Prefetcher:
+    """Warms a role -> patient IDs schedule in the background.
+
+    ``warm(role, patient_id)`` fetches one patient and returns HOT, MISSING
+    or FAILED; ``is_hot(role, patient_id)`` checks, without side effects,
+    whether the record is currently cached; ``busy()`` returns the number of
+    interactive requests in flight.
+    """
+
+    def __init__(self, warm, is_hot, busy, workers=PREFETCH_WORKERS, rate=PREFETCH_RATE,
+                 max_busy=PREFETCH_MAX_BUSY, max_ids=PREFETCH_MAX_IDS):
+        self._warm = warm
+        self._is_hot = is_hot
+        self._busy = busy
+        self.max_busy = max_busy
+        self.max_ids = max_ids
+        self._limiter = RateLimiter(rate)
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="prefetch", initializer=_lower_priority)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._schedule = {}    # role -> [patient IDs], in schedule order
+        self._status = {}      # (role, str(patient ID)) -> last warm result
+
+    def schedule(self, schedule, replace=True):
+        """Queue ``{role: [patient IDs]}``; returns the number of IDs queued.
+
+        ``replace`` drops the previous schedule, and any of its fetches not
+        yet started, e.g. when the next day's list is loaded.
+        """
+        with self._lock:
+            current = {} if replace else self._status
+            queued = []
+            seen = set()
+            for role, patient_ids in schedule.items():
+                for patient_id in patient_ids:
+                    key = (role, str(patient_id))
+                    if key not in current and key not in seen:
+                        seen.add(key)
+                        queued.append((role, patient_id))
+            if len(current) + len(queued) > self.max_ids:
+                raise ValueError(f"At most {self.max_ids} patients can be scheduled")
+
+            if replace:
+                self._generation += 1
+                self._schedule = {}
+                self._status = {}
+            generation = self._generation
+            for role, patient_id in queued:
+                self._schedule.setdefault(role, []).append(patient_id)
+                self._status[(role, str(patient_id))] = PENDING
+
+        for role, patient_id in queued:
+            self._pool.submit(self._run, generation, role, patient_id)
+        return len(queued)
+
+    def coverage(self):
+        """Per-role and overall counts of scheduled, hot, cold, pending, missing and failed."""
+        with self._lock:
+            schedule = {role: list(ids) for role, ids in self._schedule.items()}
+            status = dict(self._status)
+
+        roles = {}
+        totals = {"scheduled": 0, "hot": 0, "cold": 0, PENDING: 0, MISSING: 0, FAILED: 0}
+        for role, patient_ids in schedule.items():
+            counts = {"scheduled": len(patient_ids), "hot": 0, "cold": 0, PENDING: 0, MISSING: 0, FAILED: 0}
+            for patient_id in patient_ids:
+                # "hot" is live cache state; "cold" was warmed but has since expired or been evicted
+                if self._is_hot(role, patient_id):
+                    counts["hot"] += 1
+                else:
+                    result = status[(role, str(patient_id))]
+                    counts["cold" if result == HOT else result] += 1
+            counts["coverage"] = round(counts["hot"] / counts["scheduled"], 4) if patient_ids else 0.0
+            roles[role] = counts
+            for name in totals:
+                totals[name] += counts[name]
+
+        totals["coverage"] = round(totals["hot"] / totals["scheduled"], 4) if totals["scheduled"] else 0.0
+        return dict(totals, roles=roles)
+
+    def _run(self, generation, role, patient_id):
+        if generation != self._generation:
+            return
+        # Give way to interactive traffic, then respect the rate limit
+        while self._busy() > self.max_busy:
+            time.sleep(BUSY_POLL_SECONDS)
+        self._limiter.acquire()
+        if generation != self._generation:
+            return
+
+        try:
+            result = self._warm(role, patient_id)
+        except Exception as e:
+            print(f"Prefetch failed for {role} patient {patient_id}: {e}")
+            result = FAILED
+
+        with self._lock:
+            if generation == self._generation:
+                self._status[(role, str(patient_id))] = result
+
+
+def load_schedule(path):
+    """Read a ``{role: [patient IDs]}`` JSON file."""
+    with open(path) as f:
+        schedule = json.load(f)
+    if not isinstance(schedule, dict) or not all(isinstance(ids, list) for ids in schedule.values()):
+        raise ValueError(f"{path}: expected an object mapping role to a list of patient IDs")
+    return schedule
@@ -0,0 +1,118 @@
+# record_cache.py
+"""Bounded cache of parsed patient records, encrypted at rest in memory.
+
+Entries are keyed by (layer, patient ID, blob etag, credential fingerprint).
+Each entry is sealed with AES-GCM under a key derived from the password that
+decrypted the record, so a caller with a different password can neither hit
+nor open it. A new etag for a patient drops the entries for the old one.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cryptography.exceptions import InvalidTag
+
+from credential_seal import CredentialSeal, seal, unseal
+
+MAX_ENTRIES = int(os.environ.get("RECORD_CACHE_MAX_ENTRIES", "2048"))
+MAX_BYTES = int(os.environ.get("RECORD_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+TTL_SECONDS = float(os.environ.get("RECORD_CACHE_TTL", "300"))
+
+
+class RecordCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._seal = CredentialSeal()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (expires_at, sealed bytes)
+        self._etags = {}                # (layer, patient_id) -> current etag
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    # -----------------------------
+    # Public API
+    # -----------------------------
+    def get(self, layer, patient_id, etag, password):
+        if etag is None:
+            return None
+        key = (layer, str(patient_id), etag, self._seal.fingerprint(password))
+
+        with self._lock:
+            self._note_etag(layer, str(patient_id), etag)
+            item = self._entries.get(key)
+            if item is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, sealed = item
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+
+        try:
+            return unseal(self._seal.aead(password), sealed)
+        except InvalidTag:
+            return None
+
+    def contains(self, layer, patient_id, etag, password):
+        """True if a live entry exists; unlike get() this leaves stats and LRU order alone."""
+        if etag is None:
+            return False
+        key = (layer, str(patient_id), etag, self._seal.fingerprint(password))
+        with self._lock:
+            item = self._entries.get(key)
+            return item is not None and item[0] > time.monotonic()
+
+    def put(self, layer, patient_id, etag, password, record):
+        if etag is None:
+            return
+        sealed = seal(self._seal.aead(password), record)
+        if len(sealed) > self.max_bytes:
+            return
+
+        key = (layer, str(patient_id), etag, self._seal.fingerprint(password))
+        with self._lock:
+            self._note_etag(layer, str(patient_id), etag)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, sealed)
+            self._bytes += len(sealed)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, layer, patient_id=None):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == layer and (patient_id is None or k[1] == str(patient_id))]:
+                self._remove(key)
+                self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes)
+
+    # -----------------------------
+    # Internals (caller holds the lock)
+    # -----------------------------
+    def _note_etag(self, layer, patient_id, etag):
+        current = self._etags.get((layer, patient_id))
+        if current == etag:
+            return
+        self._etags[(layer, patient_id)] = etag
+        if current is None:
+            return
+        # The blob changed: anything cached for the old etag is stale
+        for key in [k for k in self._entries if k[0] == layer and k[1] == patient_id and k[2] != etag]:
+            self._remove(key)
+            self._stats["invalidations"] += 1
+
+    def _remove(self, key):
+        _, sealed = self._entries.pop(key)
+        self._bytes -= len(sealed)
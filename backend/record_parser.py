@@ -0,0 +1,127 @@
+# record_parser.py
+"""Table-driven parser for decrypted "Label: value" records.
+
+Every layer's record format is described by a RecordSchema. Parsing is one
+pass over the lines: each line is split once at its first ':' and the label
+is resolved with a single dict lookup, instead of trying every field's
+prefix in turn. RecordParser accepts the plaintext as a stream of byte
+chunks, so it can sit directly behind an incremental decryptor.
+"""
+
+
+class RecordSchema:
+    """How one layer's records map to JSON.
+
+    fields      -- record label -> JSON key; every key starts at ``default``
+    passthrough -- keep labels not in ``fields`` under their own name
+    defaults    -- extra keys filled in when the record lacks them
+    transforms  -- JSON key -> function applied to the final value
+    """
+
+    def __init__(self, fields=None, default="-", passthrough=False, defaults=None, transforms=None):
+        self.fields = dict(fields or {})
+        self.default = default
+        self.passthrough = passthrough
+        self.defaults = dict(defaults or {})
+        self.transforms = dict(transforms or {})
+
+    def parser(self):
+        return RecordParser(self)
+
+    def parse(self, content):
+        """Parse a whole decrypted record (str or bytes)."""
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            content = bytes(content).decode(errors="ignore")
+        record = self._new_record()
+        self._parse_lines(content.splitlines(), record)
+        return self._finish(record)
+
+    def _new_record(self):
+        return {key: self.default for key in self.fields.values()}
+
+    def _parse_lines(self, lines, record):
+        lookup = self.fields.get
+        if self.passthrough and not self.fields:
+            for line in lines:
+                label, sep, value = line.partition(":")
+                if sep:
+                    record[label.strip()] = value.strip()
+            return
+
+        passthrough = self.passthrough
+        for line in lines:
+            label, sep, value = line.partition(":")
+            if not sep:
+                continue
+            label = label.strip()
+            key = lookup(label)
+            if key is None:
+                if not passthrough:
+                    continue
+                key = label
+            record[key] = value.strip()
+
+    def _finish(self, record):
+        for key, value in self.defaults.items():
+            record.setdefault(key, value)
+        for key, transform in self.transforms.items():
+            if key in record:
+                record[key] = transform(record[key])
+        return record
+
+
+class RecordParser:
+    """Incremental parser: feed() byte chunks, then close() for the record."""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._record = schema._new_record()
+        # Pieces of the unfinished last line, joined once its newline arrives,
+        # so a long line costs one copy rather than one per chunk
+        self._pending = []
+
+    def feed(self, chunk):
+        chunk = bytes(chunk)
+        if b"\n" not in chunk:
+            if chunk:
+                self._pending.append(chunk)
+            return
+        lines = chunk.split(b"\n")
+        if self._pending:
+            self._pending.append(lines[0])
+            lines[0] = b"".join(self._pending)
+        last = lines.pop()
+        self._pending = [last] if last else []
+        self.schema._parse_lines([line.decode(errors="ignore") for line in lines], self._record)
+
+    def close(self):
+        if self._pending:
+            self.schema._parse_lines([b"".join(self._pending).decode(errors="ignore")], self._record)
+            self._pending = []
+        return self.schema._finish(self._record)
+
+
+# -----------------------------
+# Layer schemas
+# -----------------------------
+CLINICAL = RecordSchema(fields={
+    "Diagnosis": "diagnosis",
+    "Medical History": "medicalHistory",
+    "Symptoms": "symptoms",
+    "Test Results": "testResults",
+    "Prescriptions": "prescriptions",
+    "Doctor Notes": "doctorNotes",
+    "Allergies": "allergies",
+    "Referred To": "referredTo",
+    "Doctor assigned": "doctorAssigned",
+})
+
+FRONTDESK = RecordSchema(passthrough=True)
+
+BILLING = RecordSchema(
+    passthrough=True,
+    defaults={"Payment_status": "pending"},
+    transforms={"Payment_status": str.lower},
+)
+
+SCHEMAS = {"A": FRONTDESK, "B": CLINICAL, "C": BILLING}
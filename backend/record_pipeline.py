@@ -0,0 +1,114 @@
+# record_pipeline.py
+"""Bounded-concurrency download -> decrypt/parse pipeline for bulk reads.
+
+The blob listing feeds a pool of download workers, whose output feeds a pool
+of decrypt/parse workers. At most ``max_in_flight`` blobs are between the
+listing and the consumer at any time -- a slot is only given back once the
+consumer has taken its result -- so a slow consumer throttles the listing
+instead of letting downloaded records pile up in memory.
+
+The worker pools are shared by every pipeline in the process, so the
+number of download and decrypt threads does not grow with the number of
+concurrent bulk requests.
+"""
+import contextvars
+import os
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+DOWNLOAD_WORKERS = int(os.environ.get("PIPELINE_DOWNLOAD_WORKERS", "8"))
+DECRYPT_WORKERS = int(os.environ.get("PIPELINE_DECRYPT_WORKERS", str(os.cpu_count() or 2)))
+MAX_IN_FLIGHT = int(os.environ.get("PIPELINE_MAX_IN_FLIGHT", "32"))
+
+_download_pool = ThreadPoolExecutor(DOWNLOAD_WORKERS, thread_name_prefix="blob-download")
+_decrypt_pool = ThreadPoolExecutor(DECRYPT_WORKERS, thread_name_prefix="blob-decrypt")
+
+# index: position in the listing; record is None when error is set
+PipelineResult = namedtuple("PipelineResult", ["index", "blob_name", "record", "error"])
+
+_ListingDone = namedtuple("_ListingDone", ["submitted"])
+
+
+def iter_records(container_client, blobs, process,
+                 max_in_flight=MAX_IN_FLIGHT,
+                 layer=None,
+                 download_pool=None,
+                 decrypt_pool=None):
+    """Yield a PipelineResult per blob, in completion order.
+
+    ``blobs`` is any iterable of blob properties (e.g. ``list_blobs()``) and
+    ``process(blob_name, encrypted_bytes)`` returns the parsed record.
+    Exceptions from either stage are reported on the result, not raised.
+    Workers run in a copy of the caller's context, so metrics spans are
+    attributed to the request that started the pipeline.
+    """
+    download_pool = download_pool or _download_pool
+    decrypt_pool = decrypt_pool or _decrypt_pool
+    context = contextvars.copy_context()
+    results = queue.Queue()   # never holds more than max_in_flight results
+    slots = threading.Semaphore(max_in_flight)
+    stop = threading.Event()
+
+    def decrypt_stage(index, blob_name, encrypted):
+        if stop.is_set():
+            return
+        try:
+            results.put(PipelineResult(index, blob_name, process(blob_name, encrypted), None))
+        except Exception as e:
+            results.put(PipelineResult(index, blob_name, None, str(e) or type(e).__name__))
+
+    def download_stage(index, blob_name):
+        # The pools are shared: work queued for a consumer that went away is
+        # skipped rather than cancelled
+        if stop.is_set():
+            return
+        try:
+            with metrics.span("download"):
+                encrypted = container_client.download_blob(blob_name).readall()
+            metrics.record_download(layer, len(encrypted))
+        except Exception as e:
+            results.put(PipelineResult(index, blob_name, None, f"download failed: {e}"))
+            return
+        decrypt_pool.submit(context.copy().run, decrypt_stage, index, blob_name, encrypted)
+
+    def feeder():
+        submitted = 0
+        try:
+            for blob in blobs:
+                # Backpressure: wait for a free slot before pulling more work.
+                while not slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                download_pool.submit(context.copy().run, download_stage, submitted, blob.name)
+                submitted += 1
+        except Exception as e:
+            results.put(PipelineResult(submitted, None, None, f"listing failed: {e}"))
+        finally:
+            results.put(_ListingDone(submitted))
+
+    feeder_thread = threading.Thread(target=feeder, name="blob-listing", daemon=True)
+    feeder_thread.start()
+
+    expected = None
+    received = 0
+    try:
+        while expected is None or received < expected:
+            item = results.get()
+            if isinstance(item, _ListingDone):
+                expected = item.submitted
+                continue
+            if item.blob_name is None:
+                yield item
+                continue
+            received += 1
+            yield item
+            # Only now is the result off our hands
+            slots.release()
+    finally:
+        stop.set()
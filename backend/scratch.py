@@ -0,0 +1,93 @@
+# scratch.py
+"""Private, self-cleaning scratch space for code paths that need files.
+
+Each workspace is its own 0700 directory under tmpfs (/dev/shm) when
+available, files inside it are NamedTemporaryFiles so names never collide,
+and the whole directory is removed when the workspace closes, so no
+ciphertext or decrypted PHI is left behind. Bytes written are charged
+against a per-workspace quota and a process-wide quota.
+"""
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from tempfile import NamedTemporaryFile
+
+
+def _default_root():
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+SCRATCH_ROOT = os.environ.get("SCRATCH_DIR") or _default_root()
+WORKSPACE_QUOTA = int(os.environ.get("SCRATCH_WORKSPACE_QUOTA", str(64 * 1024 * 1024)))
+TOTAL_QUOTA = int(os.environ.get("SCRATCH_TOTAL_QUOTA", str(512 * 1024 * 1024)))
+
+_lock = threading.Lock()
+_total_in_use = 0
+
+
+class ScratchQuotaExceeded(Exception):
+    pass
+
+
+class Workspace:
+    def __init__(self, path, quota):
+        self.path = path
+        self.quota = quota
+        self.used = 0
+
+    def reserve(self, size):
+        """Charge ``size`` bytes to this workspace and the process budget."""
+        global _total_in_use
+        if self.used + size > self.quota:
+            raise ScratchQuotaExceeded(f"Workspace quota of {self.quota} bytes exceeded")
+        with _lock:
+            if _total_in_use + size > TOTAL_QUOTA:
+                raise ScratchQuotaExceeded(f"Scratch space quota of {TOTAL_QUOTA} bytes exceeded")
+            _total_in_use += size
+        self.used += size
+
+    def write(self, data, suffix=""):
+        """Write ``data`` to a new file in the workspace and return its path."""
+        self.reserve(len(data))
+        with NamedTemporaryFile(dir=self.path, suffix=suffix, delete=False) as f:
+            f.write(data)
+            return f.name
+
+    def new_path(self, suffix=""):
+        """Reserve a unique, not yet existing file name (e.g. for a tool's output)."""
+        with NamedTemporaryFile(dir=self.path, suffix=suffix, delete=False) as f:
+            name = f.name
+        os.unlink(name)
+        return name
+
+    def read(self, path):
+        size = os.path.getsize(path)
+        self.reserve(size)
+        with open(path, "rb") as f:
+            return f.read()
+
+    def _release(self):
+        global _total_in_use
+        with _lock:
+            _total_in_use -= self.used
+        self.used = 0
+
+
+@contextmanager
+def workspace(quota=WORKSPACE_QUOTA):
+    path = tempfile.mkdtemp(prefix="ehr-", dir=SCRATCH_ROOT)  # created 0700
+    ws = Workspace(path, quota)
+    try:
+        yield ws
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+        ws._release()
+
+
+def in_use():
+    with _lock:
+        return _total_in_use
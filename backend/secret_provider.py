@@ -0,0 +1,150 @@
+# secret_provider.py
+"""Cached access to Key Vault secrets.
+
+CachedSecretProvider keeps a secret in memory for ``ttl`` seconds, refreshes
+it in a background thread once it is within ``refresh_ahead`` seconds of
+expiry, and keeps serving the last known value for up to ``max_stale``
+seconds if the vault cannot be reached. Once the value has expired, one
+caller retries the vault while the others get the last known value straight
+away, and after a failed fetch the vault is left alone for ``retry_backoff``
+seconds. A new secret version replaces the old one atomically.
+"""
+import os
+import threading
+import time
+
+SECRET_TTL = float(os.environ.get("SECRET_TTL", "300"))
+SECRET_REFRESH_AHEAD = float(os.environ.get("SECRET_REFRESH_AHEAD", "60"))
+SECRET_MAX_STALE = float(os.environ.get("SECRET_MAX_STALE", "900"))
+SECRET_RETRY_BACKOFF = float(os.environ.get("SECRET_RETRY_BACKOFF", "30"))
+
+
+class KeyVaultSecretSource:
+    def __init__(self, secret_client):
+        self._client = secret_client
+
+    def fetch(self, name):
+        secret = self._client.get_secret(name)
+        return secret.value, secret.properties.version
+
+
+class LocalSecretSource:
+    """Offline stand-in for Key Vault, for local runs and tests."""
+
+    def __init__(self, secrets=None):
+        self._lock = threading.Lock()
+        self._secrets = {}
+        self.fetch_count = 0
+        for name, value in (secrets or {}).items():
+            self.set(name, value)
+
+    def set(self, name, value):
+        with self._lock:
+            _, version = self._secrets.get(name, (None, 0))
+            self._secrets[name] = (value, version + 1)
+
+    def fetch(self, name):
+        with self._lock:
+            self.fetch_count += 1
+            if name not in self._secrets:
+                raise KeyError(f"Secret {name} not found")
+            value, version = self._secrets[name]
+            return value, str(version)
+
+
+class CachedSecretProvider:
+    def __init__(self, source, name, ttl=SECRET_TTL, refresh_ahead=SECRET_REFRESH_AHEAD,
+                 max_stale=SECRET_MAX_STALE, retry_backoff=SECRET_RETRY_BACKOFF):
+        self.source = source
+        self.name = name
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+        self.max_stale = max_stale
+        self.retry_backoff = retry_backoff
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._refreshing = False
+        self._value = None
+        self._version = None
+        self._fetched_at = 0.0
+        self._retry_at = 0.0    # no vault call before this after a failure
+        self.stats = {"fetches": 0, "failures": 0, "rotations": 0, "stale_served": 0}
+
+    def get(self):
+        now = time.monotonic()
+        with self._lock:
+            value = self._value
+            age = now - self._fetched_at
+            start_background = (
+                value is not None
+                and self.ttl - self.refresh_ahead <= age < self.ttl
+                and not self._refreshing
+            )
+            if start_background:
+                self._refreshing = True
+
+        if value is not None and age < self.ttl:
+            if start_background:
+                threading.Thread(target=self._background_refresh, name=f"secret-refresh-{self.name}",
+                                 daemon=True).start()
+            return value
+
+        if value is not None and age < self.ttl + self.max_stale:
+            # Expired but still usable: one caller retries the vault (unless a
+            # recent failure says to back off); everyone else gets it now
+            with self._lock:
+                backing_off = now < self._retry_at
+            if backing_off or not self._fetch_lock.acquire(blocking=False):
+                return self._serve_stale(value)
+            try:
+                return self.refresh()
+            except Exception as e:
+                print(f"Secret {self.name} refresh failed, serving last known value: {e}")
+                return self._serve_stale(value)
+            finally:
+                self._fetch_lock.release()
+
+        # Never fetched (or too stale to use): one caller goes to the vault, the rest wait
+        with self._fetch_lock:
+            with self._lock:
+                if self._value is not None and time.monotonic() - self._fetched_at < self.ttl:
+                    return self._value
+            return self.refresh()
+
+    def _serve_stale(self, value):
+        with self._lock:
+            self.stats["stale_served"] += 1
+        return value
+
+    def refresh(self):
+        try:
+            value, version = self.source.fetch(self.name)
+        except Exception:
+            with self._lock:
+                self.stats["failures"] += 1
+                self._retry_at = time.monotonic() + self.retry_backoff
+            raise
+
+        with self._lock:
+            self.stats["fetches"] += 1
+            if self._version is not None and version != self._version:
+                self.stats["rotations"] += 1
+                print(f"Secret {self.name} rotated to version {version}")
+            self._value = value
+            self._version = version
+            self._fetched_at = time.monotonic()
+            return value
+
+    @property
+    def version(self):
+        with self._lock:
+            return self._version
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Background refresh of secret {self.name} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
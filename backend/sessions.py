@@ -0,0 +1,227 @@
+# sessions.py
+"""Short-lived login sessions.
+
+verify_login creates a session and hands the client a signed token,
+``<session id>.<expiry>.<hmac>``. Later requests send the token instead of
+the role password; the password stays server-side, together with the
+session's cache of derived AES keys (aes_engine.KeyCache). Sessions expire
+after SESSION_TTL seconds. Two backends, as for login challenges:
+
+    MemorySessionStore -- one process
+    SQLiteSessionStore -- shared by every worker on the host
+
+The SQLite store keeps each password sealed with AES-GCM under a key derived
+from SESSION_SECRET, which must then be set (the same value in every
+worker) since it also signs the tokens. Derived keys are never shared;
+each worker caches its own per session.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+import aes_engine
+from expiring_store import SQLiteTable, purge_expired
+
+SESSION_TTL = float(os.environ.get("SESSION_TTL", "900"))
+SESSION_MAX = int(os.environ.get("SESSION_MAX", "1000"))
+SESSION_KEY_CACHE = int(os.environ.get("SESSION_KEY_CACHE", "4096"))
+SESSION_SECRET = os.environ.get("SESSION_SECRET")
+SESSION_DB = os.environ.get(
+    "SESSION_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sessions.sqlite3"),
+)
+
+NONCE_SIZE = 12
+
+
+class Session:
+    def __init__(self, session_id, username, password, expires_at, keys=None):
+        self.id = session_id
+        self.username = username
+        self.password = password
+        self.expires_at = expires_at
+        self.keys = keys or aes_engine.KeyCache(password, SESSION_KEY_CACHE)
+
+
+class _SessionStore:
+    """Token signing and stats; subclasses store the sessions."""
+
+    def __init__(self, ttl, max_sessions, secret):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._secret = secret.encode() if isinstance(secret, str) else secret
+        self._stats_lock = threading.Lock()
+        self._stats = {"created": 0, "expired": 0, "revoked": 0, "rejected": 0}
+
+    def _sign(self, payload):
+        return hmac.new(self._secret, payload.encode(), hashlib.sha256).hexdigest()
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def create(self, username, password):
+        """Start a session; returns ``(token, expires_at)``."""
+        session_id = base64.urlsafe_b64encode(os.urandom(18)).decode()
+        expires_at = int(time.time() + self.ttl)
+        self._put(Session(session_id, username, password, expires_at))
+        self._count("created")
+        payload = f"{session_id}.{expires_at}"
+        return f"{payload}.{self._sign(payload)}", expires_at
+
+    def resolve(self, token):
+        """The live Session for ``token``, or None if forged, expired or revoked."""
+        session_id = self._verify(token)
+        if session_id is None:
+            return None
+        session = self._get(session_id)
+        if session is None:
+            self._count("rejected")
+            return None
+        if session.expires_at <= time.time():
+            self._delete(session_id)
+            self._count("expired")
+            return None
+        return session
+
+    def revoke(self, token):
+        session_id = self._verify(token)
+        if session_id is not None and self._delete(session_id):
+            self._count("revoked")
+            return True
+        return False
+
+    def stats(self):
+        active = self._active()
+        with self._stats_lock:
+            return dict(self._stats, active=active)
+
+    def _verify(self, token):
+        # Checked before any lookup, so forged tokens never touch the store
+        try:
+            session_id, expires_at, signature = str(token).split(".")
+            expired = int(expires_at) <= time.time()
+        except ValueError:
+            expired, signature = True, ""
+        # Compared as bytes: compare_digest rejects non-ASCII str with TypeError
+        if expired or not hmac.compare_digest(
+                signature.encode(), self._sign(f"{session_id}.{expires_at}").encode()):
+            self._count("rejected")
+            return None
+        return session_id
+
+
+class MemorySessionStore(_SessionStore):
+    def __init__(self, ttl=SESSION_TTL, max_sessions=SESSION_MAX, secret=None):
+        super().__init__(ttl, max_sessions, secret or SESSION_SECRET or os.urandom(32))
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()   # session id -> Session, oldest first
+
+    def _put(self, session):
+        with self._lock:
+            self._purge(time.time())
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def _get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def _delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _active(self):
+        with self._lock:
+            self._purge(time.time())
+            return len(self._sessions)
+
+    def _purge(self, now):
+        # Caller holds the lock
+        self._count("expired", purge_expired(self._sessions, now, lambda session: session.expires_at))
+
+
+class SQLiteSessionStore(_SessionStore):
+    def __init__(self, path=SESSION_DB, ttl=SESSION_TTL, max_sessions=SESSION_MAX, secret=None):
+        secret = secret or SESSION_SECRET
+        if not secret:
+            raise ValueError("SESSION_STORE=sqlite needs SESSION_SECRET (the same value in every worker)")
+        super().__init__(ttl, max_sessions, secret)
+        self.path = path
+        self._aead = AESGCM(hmac.new(self._secret, b"seal", hashlib.sha256).digest())
+        self._lock = threading.Lock()
+        self._keys = OrderedDict()   # session id -> this worker's KeyCache
+        # Sessions share one TTL, so expiry order is creation order
+        self._table = SQLiteTable(path, "sessions", "session_id", "expires_at", (
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " username TEXT NOT NULL,"
+            " sealed_password BLOB NOT NULL,"
+            " expires_at REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (expires_at)",
+        ))
+
+    def _put(self, session):
+        nonce = os.urandom(NONCE_SIZE)
+        sealed = nonce + self._aead.encrypt(nonce, session.password.encode(), session.id.encode())
+        purged = self._table.insert(
+            {"session_id": session.id, "username": session.username,
+             "sealed_password": sealed, "expires_at": session.expires_at},
+            time.time(), self.max_sessions,
+        )
+        self._count("expired", purged)
+        self._cache_keys(session.id, session.keys)
+
+    def _get(self, session_id):
+        row = self._table.connect().execute(
+            "SELECT username, sealed_password, expires_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        username, sealed, expires_at = row
+        try:
+            password = self._aead.decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], session_id.encode()).decode()
+        except InvalidTag:
+            # Sealed under a different SESSION_SECRET
+            return None
+        with self._lock:
+            keys = self._keys.get(session_id)
+            if keys is not None:
+                self._keys.move_to_end(session_id)
+        if keys is None:
+            keys = self._cache_keys(session_id, aes_engine.KeyCache(password, SESSION_KEY_CACHE))
+        return Session(session_id, username, password, expires_at, keys)
+
+    def _cache_keys(self, session_id, keys):
+        with self._lock:
+            keys = self._keys.setdefault(session_id, keys)
+            while len(self._keys) > self.max_sessions:
+                self._keys.popitem(last=False)
+        return keys
+
+    def _delete(self, session_id):
+        with self._lock:
+            self._keys.pop(session_id, None)
+        cursor = self._table.connect().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        return cursor.rowcount == 1
+
+    def _active(self):
+        return self._table.live_count(time.time())
+
+
+def from_env():
+    # Not tied to CHALLENGE_STORE: the SQLite store needs SESSION_SECRET as well
+    backend = os.environ.get("SESSION_STORE", "memory")
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend != "memory":
+        raise ValueError(f"Unknown SESSION_STORE {backend!r} (use memory or sqlite)")
+    return MemorySessionStore()
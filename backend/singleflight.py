@@ -0,0 +1,68 @@
+# singleflight.py
+"""Coalesce concurrent identical calls into one execution.
+
+While a call for a key is running, further calls with the same key wait for
+it and receive its result (or exception) instead of repeating the work.
+Nothing is kept once the call returns; caching is record_cache.py's job.
+"""
+import hashlib
+import hmac
+import os
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class Group:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}   # key -> _Call in progress
+        self._stats = {"executions": 0, "coalesced": 0}
+        # Per-process secret so keys identify a credential without holding it
+        self._secret = os.urandom(32)
+
+    def fingerprint(self, credential):
+        return hmac.new(self._secret, credential.encode(), hashlib.sha256).hexdigest()
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` once per concurrent ``key``.
+
+        Returns ``(result, shared)``; ``shared`` is True when the result was
+        handed to more than one caller, who must then not mutate it.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["executions"] += 1
+            else:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, call.waiters > 0
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
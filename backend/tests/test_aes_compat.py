@@ -0,0 +1,123 @@
+# test_aes_compat.py
+"""aes_engine against ciphertext produced by aes_gcm.exe.
+
+fixtures/aes_gcm/ holds, for each plaintext <name>.txt, the output of
+
+    aes_gcm.exe encrypt 'Fixture#Pass1' <name>.txt exe_<name>.enc
+
+from the checked-in binary, and src_<name>.enc from the same command with
+aes_gcm.c built locally (gcc aes_gcm.c -lcrypto). The checked-in binary
+writes an all-zero salt and IV, so the src_ fixtures are the ones that show
+salt and IV are read from the right offsets.
+
+Run with ``python -m pytest backend/tests``.
+"""
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import aes_engine  # noqa: E402
+from aes_engine import HEADER_SIZE, TAG_SIZE, DecryptionError, StreamDecryptor, decrypt_bytes  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "aes_gcm")
+PASSWORD = "Fixture#Pass1"
+NAMES = ["short", "long", "empty"]
+FIXTURES = [(f"{origin}_{name}", name) for origin in ("exe", "src") for name in NAMES]
+
+
+def read(filename):
+    with open(os.path.join(FIXTURE_DIR, filename), "rb") as f:
+        return f.read()
+
+
+def stream_decrypt(password, data, chunk_size):
+    """Decrypt the way blob_stream does: header and tag first, then the body in chunks."""
+    decryptor = StreamDecryptor(password, data[:HEADER_SIZE], data[-TAG_SIZE:])
+    body = data[HEADER_SIZE:-TAG_SIZE]
+    plaintext = b"".join(decryptor.update(body[i:i + chunk_size]) for i in range(0, len(body), chunk_size))
+    return plaintext + decryptor.finalize()
+
+
+def with_flipped_byte(data, index):
+    tampered = bytearray(data)
+    tampered[index] ^= 0x01
+    return bytes(tampered)
+
+
+# -----------------------------
+# Correct decrypt
+# -----------------------------
+@pytest.mark.parametrize("fixture,name", FIXTURES)
+def test_decrypt_bytes_matches_plaintext(fixture, name):
+    assert decrypt_bytes(PASSWORD, read(f"{fixture}.enc")) == read(f"{name}.txt")
+
+
+@pytest.mark.parametrize("fixture,name", FIXTURES)
+@pytest.mark.parametrize("chunk_size", [7, 97, 4096])
+def test_stream_decryptor_matches_plaintext(fixture, name, chunk_size):
+    assert stream_decrypt(PASSWORD, read(f"{fixture}.enc"), chunk_size) == read(f"{name}.txt")
+
+
+@pytest.mark.parametrize("fixture,name", FIXTURES)
+def test_decrypt_bytes_accepts_memoryview(fixture, name):
+    assert decrypt_bytes(PASSWORD, memoryview(read(f"{fixture}.enc"))) == read(f"{name}.txt")
+
+
+def test_encrypt_bytes_round_trips_in_exe_format():
+    plaintext = read("long.txt")
+    data = aes_engine.encrypt_bytes(PASSWORD, plaintext)
+    assert len(data) == HEADER_SIZE + len(plaintext) + TAG_SIZE
+    assert decrypt_bytes(PASSWORD, data) == plaintext
+
+
+# -----------------------------
+# Rejected records
+# -----------------------------
+@pytest.mark.parametrize("fixture,name", FIXTURES)
+def test_wrong_password_is_rejected(fixture, name):
+    data = read(f"{fixture}.enc")
+    with pytest.raises(DecryptionError):
+        decrypt_bytes("Fixture#Pass2", data)
+    with pytest.raises(DecryptionError):
+        stream_decrypt("Fixture#Pass2", data, 4096)
+
+
+@pytest.mark.parametrize("fixture", ["exe_short", "src_short", "exe_long", "src_long"])
+@pytest.mark.parametrize("cut", [1, TAG_SIZE, 100])
+def test_truncated_record_is_rejected(fixture, cut):
+    data = read(f"{fixture}.enc")[:-cut]
+    with pytest.raises(DecryptionError):
+        decrypt_bytes(PASSWORD, data)
+    with pytest.raises(DecryptionError):
+        stream_decrypt(PASSWORD, data, 4096)
+
+
+@pytest.mark.parametrize("length", [0, HEADER_SIZE, HEADER_SIZE + TAG_SIZE - 1])
+def test_record_shorter_than_header_and_tag_is_rejected(length):
+    data = read("src_short.enc")[:length]
+    with pytest.raises(DecryptionError):
+        decrypt_bytes(PASSWORD, data)
+    with pytest.raises(DecryptionError):
+        StreamDecryptor(PASSWORD, data[:HEADER_SIZE], data[HEADER_SIZE:])
+
+
+@pytest.mark.parametrize("fixture,name", FIXTURES)
+def test_tampered_tag_is_rejected(fixture, name):
+    data = with_flipped_byte(read(f"{fixture}.enc"), -1)
+    with pytest.raises(DecryptionError):
+        decrypt_bytes(PASSWORD, data)
+    with pytest.raises(DecryptionError):
+        stream_decrypt(PASSWORD, data, 4096)
+
+
+@pytest.mark.parametrize("fixture", ["exe_short", "src_short", "exe_long", "src_long"])
+def test_tampered_ciphertext_is_rejected(fixture):
+    data = with_flipped_byte(read(f"{fixture}.enc"), HEADER_SIZE)
+    with pytest.raises(DecryptionError):
+        decrypt_bytes(PASSWORD, data)
+    with pytest.raises(DecryptionError):
+        stream_decrypt(PASSWORD, data, 4096)
@@ -0,0 +1,54 @@
+# test_billing_stream.py
+"""The NDJSON billing stream only decrypts as far ahead as its reader allows."""
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+# Offline stand-ins for Key Vault and the on-disk blob index
+os.environ.setdefault("KMASTER_LOCAL", "test-kmaster")
+os.environ.setdefault("BLOB_INDEX_DIR", tempfile.mkdtemp(prefix="ehr-test-index-"))
+
+import pytest  # noqa: E402
+
+import blob_clients  # noqa: E402
+import fakes  # noqa: E402
+import handlers  # noqa: E402
+import record_pipeline  # noqa: E402
+
+PATIENTS = 200
+PASSWORD = handlers.PASSWORDS["BillingDesk"]
+
+
+@pytest.fixture
+def billing_container(monkeypatch):
+    service_client = fakes.FakeBlobServiceClient([handlers.CONTAINERS["C"]])
+    fakes.populate(service_client, {"C": handlers.CONTAINERS["C"]}, {"C": PASSWORD}, PATIENTS, fake_aes=True)
+    blob_clients.init_blob_clients(None, {"C": handlers.CONTAINERS["C"]}, service_client=service_client)
+    monkeypatch.setattr(handlers, "decrypt_bytes", fakes.fake_decrypt)
+    return service_client.get_container_client(handlers.CONTAINERS["C"])
+
+
+def test_stream_returns_every_record(billing_container):
+    payload, status, _ = handlers.api_fetch_billingdesk_stream({"password": PASSWORD})
+    assert status == 200
+    lines = [json.loads(line) for line in payload]
+    assert sum("record" in line for line in lines) == PATIENTS
+    assert lines[-1] == {"done": True, "count": PATIENTS, "failed": 0}
+
+
+def test_slow_reader_keeps_buffered_records_bounded(billing_container):
+    payload, status, _ = handlers.api_fetch_billingdesk_stream({"password": PASSWORD})
+    assert status == 200
+    for read in range(1, 4):
+        next(payload)
+        time.sleep(0.5)
+        # Decrypted but not yet sent to the client
+        buffered = billing_container.calls["download_blob"] - read
+        assert buffered < record_pipeline.MAX_IN_FLIGHT
+    payload.close()
@@ -0,0 +1,97 @@
+# test_blob_clients.py
+"""Connection reuse by the shared Blob clients, against a local HTTP stub.
+
+The stub answers blob property requests over HTTP/1.1 keep-alive, so the
+real SDK pipeline and the pooled requests session are exercised end to end.
+"""
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import blob_clients  # noqa: E402
+
+CONTAINERS = {"A": "layer-a", "B": "layer-b"}
+# The well-known Azurite development key; the stub ignores signatures
+ACCOUNT_KEY = "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
+
+
+class StubBlobHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubBlobHandler.lock:
+            StubBlobHandler.connections += 1
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "64")
+        self.send_header("ETag", '"0x1"')
+        self.send_header("Last-Modified", "Sun, 18 Oct 2026 12:00:00 GMT")
+        self.send_header("x-ms-blob-type", "BlockBlob")
+        self.send_header("x-ms-version", "2021-08-06")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubBlobHandler.connections = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBlobHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def connection_string(server):
+    host, port = server.server_address
+    return (f"DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;AccountKey={ACCOUNT_KEY};"
+            f"BlobEndpoint=http://{host}:{port}/devstoreaccount1;")
+
+
+def test_requests_reuse_pooled_connections(stub_server):
+    blob_clients.init_blob_clients(connection_string(stub_server), CONTAINERS, pool_size=4)
+    requests_made = 0
+    for layer in ("A", "B"):
+        container_client = blob_clients.get_container_client(layer)
+        for i in range(20):
+            assert container_client.get_blob_client(f"patient_{i}.enc").get_blob_properties().etag == '"0x1"'
+            requests_made += 1
+
+    (host_stats,) = blob_clients.pool_stats().values()
+    assert host_stats["requests"] == requests_made
+    assert host_stats["connections"] == 1
+    assert StubBlobHandler.connections == 1
+
+
+def test_concurrent_requests_stay_within_pool(stub_server):
+    pool_size = 4
+    blob_clients.init_blob_clients(connection_string(stub_server), CONTAINERS, pool_size=pool_size)
+    container_client = blob_clients.get_container_client("B")
+
+    def etag_of(i):
+        return container_client.get_blob_client(f"patient_{i}.enc").get_blob_properties().etag
+
+    with ThreadPoolExecutor(8) as pool:
+        etags = list(pool.map(etag_of, range(80)))
+    assert etags == ['"0x1"'] * 80
+
+    (host_stats,) = blob_clients.pool_stats().values()
+    assert host_stats["requests"] == 80
+    assert host_stats["connections"] < host_stats["requests"]
+    # The stub sees every connection opened, including any not kept by the pool
+    assert StubBlobHandler.connections < 80
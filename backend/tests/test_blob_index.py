@@ -0,0 +1,73 @@
+# test_blob_index.py
+"""Patient ID lookups and miss-triggered refreshes in blob_index.BlobIndex."""
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+import blob_index  # noqa: E402
+import fakes  # noqa: E402
+from blob_index import BlobIndex  # noqa: E402
+
+NAMES = ["patient_210014.enc", "v2_patient_1023.enc", "P3001.enc", "records/patient_X77-b.enc", "patient_0042.enc"]
+
+
+@pytest.fixture
+def container():
+    container_client = fakes.FakeContainerClient("layer-a")
+    for name in NAMES:
+        container_client.upload_blob(name, b"record")
+    return container_client
+
+
+@pytest.fixture
+def index(container, tmp_path):
+    return BlobIndex("layer-a", lambda: container, index_dir=str(tmp_path))
+
+
+@pytest.mark.parametrize("patient_id,blob_name", [
+    (210014, "patient_210014.enc"),
+    ("1023", "v2_patient_1023.enc"),
+    ("42", "patient_0042.enc"),
+    ("0042", "patient_0042.enc"),
+    ("P3001", "P3001.enc"),
+    (" P3001 ", "P3001.enc"),
+    ("X77", "records/patient_X77-b.enc"),
+    ("patient_X77-b", "records/patient_X77-b.enc"),
+])
+def test_lookup(index, patient_id, blob_name):
+    assert index.lookup(patient_id) == blob_name
+
+
+def test_unknown_numeric_id_does_not_match_a_longer_one(index):
+    assert index.lookup("21001") is None
+
+
+def test_miss_refreshes_after_a_routine_refresh(index, container):
+    index.ensure_ready()
+    container.upload_blob("patient_555.enc", b"record")
+    assert index.lookup("555") == "patient_555.enc"
+
+
+def test_misses_refresh_at_most_once_per_interval(index, container, monkeypatch):
+    monkeypatch.setattr(blob_index, "MIN_REFRESH_INTERVAL", 30.0)
+    assert index.lookup("999") is None
+    listings = container.calls["list_blobs"]
+    container.upload_blob("patient_999.enc", b"record")
+    assert index.lookup("999") is None
+    assert container.calls["list_blobs"] == listings
+
+    monkeypatch.setattr(blob_index, "MIN_REFRESH_INTERVAL", 0.0)
+    assert index.lookup("999") == "patient_999.enc"
+
+
+def test_index_survives_reload(index, container, tmp_path):
+    index.ensure_ready()
+    reloaded = BlobIndex("layer-a", lambda: container, index_dir=str(tmp_path))
+    assert reloaded.load()
+    assert reloaded.lookup("P3001", refresh=False) == "P3001.enc"
+    assert reloaded.lookup("1023", refresh=False) == "v2_patient_1023.enc"
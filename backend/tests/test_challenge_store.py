@@ -0,0 +1,60 @@
+# test_challenge_store.py
+"""Single-use login challenges in both challenge_store backends."""
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import challenge_store  # noqa: E402
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return challenge_store.SQLiteChallengeStore(path=str(tmp_path / "challenges.sqlite3"))
+    return challenge_store.MemoryChallengeStore()
+
+
+def test_challenge_is_single_use(store):
+    challenge = store.issue("GP")
+    assert store.consume("GP", challenge.hex()) == challenge
+    assert store.consume("GP", challenge.hex()) is None
+
+
+def test_latest_challenge_is_used_without_one_named(store):
+    store.issue("GP")
+    latest = store.issue("GP")
+    assert store.consume("GP") == latest
+
+
+def test_wrong_user_does_not_burn_the_challenge(store):
+    challenge = store.issue("GP")
+    assert store.consume("CARDIO", challenge.hex()) is None
+    assert store.consume("GP", challenge.hex()) == challenge
+
+
+def test_expired_challenge_is_rejected(store):
+    store.ttl = -1
+    challenge = store.issue("GP")
+    assert store.consume("GP", challenge.hex()) is None
+    assert len(store) == 0
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "challenges.sqlite3")
+    challenge = challenge_store.SQLiteChallengeStore(path=path).issue("GP")
+    other = challenge_store.SQLiteChallengeStore(path=path)
+    assert len(other) == 1
+    assert other.consume("GP") == challenge
+
+
+def test_oldest_challenges_are_dropped_beyond_max_entries(store):
+    store.max_entries = 2
+    first = store.issue("GP")
+    store.issue("GP")
+    store.issue("GP")
+    assert len(store) == 2
+    assert store.consume("GP", first.hex()) is None
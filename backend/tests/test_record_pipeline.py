@@ -0,0 +1,78 @@
+# test_record_pipeline.py
+"""Backpressure and error reporting in record_pipeline.iter_records."""
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+import fakes  # noqa: E402
+import record_pipeline  # noqa: E402
+
+BLOBS = 500
+
+
+def container(blobs=BLOBS):
+    container_client = fakes.FakeContainerClient("layer-c")
+    for i in range(blobs):
+        container_client.upload_blob(f"patient_{100000 + i}.enc", f"record {i}".encode())
+    return container_client
+
+
+def process(blob_name, encrypted):
+    return encrypted.decode()
+
+
+def wait_for_downloads(container_client, seconds=0.5):
+    """Downloads seen once the pipeline has had ``seconds`` to run ahead."""
+    time.sleep(seconds)
+    return container_client.calls["download_blob"]
+
+
+def test_yields_every_record():
+    container_client = container()
+    results = list(record_pipeline.iter_records(container_client, container_client.list_blobs(), process))
+    assert len(results) == BLOBS
+    assert sorted(result.index for result in results) == list(range(BLOBS))
+    assert all(result.error is None and result.record.startswith("record ") for result in results)
+
+
+def test_stalled_consumer_caps_downloads():
+    container_client = container()
+    records = record_pipeline.iter_records(
+        container_client, container_client.list_blobs(), process, max_in_flight=4)
+    next(records)
+    # Held by the consumer, plus at most three more downloaded ahead of it
+    assert wait_for_downloads(container_client) <= 4
+    next(records)
+    next(records)
+    assert wait_for_downloads(container_client) <= 6
+    assert len(list(records)) == BLOBS - 3
+
+
+def test_closed_consumer_stops_downloads():
+    container_client = container()
+    records = record_pipeline.iter_records(
+        container_client, container_client.list_blobs(), process, max_in_flight=4)
+    next(records)
+    records.close()
+    downloads = wait_for_downloads(container_client)
+    assert downloads <= 4
+    assert wait_for_downloads(container_client) == downloads
+
+
+def test_failures_are_reported_on_results():
+    container_client = container(blobs=3)
+
+    def failing(blob_name, encrypted):
+        if blob_name.endswith("1.enc"):
+            raise ValueError("bad record")
+        return process(blob_name, encrypted)
+
+    blobs = list(container_client.list_blobs()) + [fakes.FakeBlobProperties("missing.enc", '"0x0"', 0, None)]
+    results = {result.blob_name: result for result in record_pipeline.iter_records(container_client, blobs, failing)}
+    assert results["patient_100000.enc"].record == "record 0"
+    assert results["patient_100001.enc"].error == "bad record"
+    assert results["missing.enc"].error.startswith("download failed")
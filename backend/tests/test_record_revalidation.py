@@ -0,0 +1,60 @@
+# test_record_revalidation.py
+"""Cached single-patient records against updates to their blobs."""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+# Offline stand-ins for Key Vault and the on-disk blob index
+os.environ.setdefault("KMASTER_LOCAL", "test-kmaster")
+os.environ.setdefault("BLOB_INDEX_DIR", tempfile.mkdtemp(prefix="ehr-test-index-"))
+
+import pytest  # noqa: E402
+
+import blob_clients  # noqa: E402
+import fakes  # noqa: E402
+import handlers  # noqa: E402
+import record_parser  # noqa: E402
+from blob_index import BlobIndex  # noqa: E402
+
+PASSWORD = handlers.PASSWORDS["GP"]
+BLOB = "patient_100000.enc"
+
+
+@pytest.fixture
+def container(monkeypatch, tmp_path):
+    service_client = fakes.FakeBlobServiceClient([handlers.CONTAINERS["B"]])
+    blob_clients.init_blob_clients(None, {"B": handlers.CONTAINERS["B"]}, service_client=service_client)
+    container_client = service_client.get_container_client(handlers.CONTAINERS["B"])
+    container_client.upload_blob(BLOB, fakes.fake_encrypt(PASSWORD, b"Diagnosis: flu\n"))
+
+    monkeypatch.setattr(handlers, "decrypt_bytes", fakes.fake_decrypt)
+    monkeypatch.setattr(handlers, "MIRROR", None)
+    monkeypatch.setattr(handlers, "RECORD_CACHE", handlers.RecordCache())
+    monkeypatch.setattr(handlers, "_etag_confirmed", {})
+    index = BlobIndex(handlers.CONTAINERS["B"], lambda: container_client, index_dir=str(tmp_path))
+    monkeypatch.setitem(handlers.BLOB_INDEXES, "B", index)
+    return container_client
+
+
+def fetch():
+    return handlers.fetch_patient_record("B", 100000, PASSWORD, record_parser.CLINICAL)["diagnosis"]
+
+
+def test_hits_within_the_bound_make_no_requests(container):
+    assert fetch() == "flu"
+    calls = dict(container.calls)
+    for _ in range(5):
+        assert fetch() == "flu"
+    assert container.calls == calls
+
+
+def test_hit_after_the_bound_sees_an_update(container, monkeypatch):
+    monkeypatch.setattr(handlers, "CACHE_REVALIDATE_SECONDS", 0.0)
+    assert fetch() == "flu"
+    container.upload_blob(BLOB, fakes.fake_encrypt(PASSWORD, b"Diagnosis: asthma\n"))
+    assert fetch() == "asthma"
+    assert container.calls["get_blob_properties"] == 1
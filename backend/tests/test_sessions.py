@@ -0,0 +1,71 @@
+# test_sessions.py
+"""Session tokens and the session store backends."""
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import sessions  # noqa: E402
+
+SECRET = "test-session-secret"
+
+
+def sqlite_store(tmp_path, **kwargs):
+    return sessions.SQLiteSessionStore(path=str(tmp_path / "sessions.sqlite3"), secret=SECRET, **kwargs)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return sqlite_store(tmp_path)
+    return sessions.MemorySessionStore(secret=SECRET)
+
+
+def test_token_resolves_until_revoked(store):
+    token, _ = store.create("GP", "pw")
+    session = store.resolve(token)
+    assert (session.username, session.password) == ("GP", "pw")
+    assert store.revoke(token)
+    assert store.resolve(token) is None
+
+
+@pytest.mark.parametrize("token", ["", "a.b", "a.9999999999.é", "a.9999999999." + "0" * 64, None])
+def test_forged_tokens_are_rejected(store, token):
+    assert store.resolve(token) is None
+
+
+def test_oldest_sessions_are_dropped_beyond_max(store):
+    store.max_sessions = 2
+    tokens = [store.create("GP", "pw")[0] for _ in range(3)]
+    assert store.resolve(tokens[0]) is None
+    assert store.stats()["active"] == 2
+
+
+def test_expired_sessions_are_purged(store):
+    store.ttl = -1
+    store.create("GP", "pw")
+    store.ttl = 60
+    store.create("GP", "pw")
+    assert store.stats()["active"] == 1
+
+
+def test_sqlite_sessions_resolve_in_another_worker(tmp_path):
+    token, _ = sqlite_store(tmp_path).create("GP", "pw")
+    assert sqlite_store(tmp_path).resolve(token).password == "pw"
+
+
+def test_memory_is_the_default_even_with_sqlite_challenges(monkeypatch):
+    monkeypatch.delenv("SESSION_STORE", raising=False)
+    monkeypatch.setenv("CHALLENGE_STORE", "sqlite")
+    monkeypatch.setattr(sessions, "SESSION_SECRET", None)
+    assert isinstance(sessions.from_env(), sessions.MemorySessionStore)
+
+
+def test_sqlite_store_names_the_missing_secret(monkeypatch, tmp_path):
+    monkeypatch.setenv("SESSION_STORE", "sqlite")
+    monkeypatch.setattr(sessions, "SESSION_SECRET", None)
+    with pytest.raises(ValueError, match="SESSION_SECRET"):
+        sessions.from_env()
@@ -15,6 +15,7 @@ export default function LoginPage() {
   const [systemId, setSystemId] = useState("")
   const [error, setError] = useState("")
   const [loggedInUser, setLoggedInUser] = useState(null)
+  const [sessionToken, setSessionToken] = useState(null)
   const [showPassword, setShowPassword] = useState(false)
 
   // -----------------------------
@@ -80,6 +81,7 @@ export default function LoginPage() {
             username,
             password,
             system_id: systemId,
+            challenge: challengeData.challenge,
           }),
         }
       )
@@ -89,6 +91,8 @@ export default function LoginPage() {
 
       if (verifyRes.status === 200) {
         console.log("[AUTH] Login verified successfully!")
+        // Dashboards authenticate with the session token from here on
+        setSessionToken(verifyData.token)
         setLoggedInUser(username)
       } else {
         setError(verifyData.error || "Login failed")
@@ -103,6 +107,14 @@ export default function LoginPage() {
   // Logout
   // -----------------------------
   const handleLogout = () => {
+    if (sessionToken) {
+      fetch("http://127.0.0.1:8000/api/logout", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ token: sessionToken }),
+      }).catch((err) => console.error("[AUTH] Logout error:", err))
+    }
+    setSessionToken(null)
     setLoggedInUser(null)
     setUsername("")
     setPassword("")
@@ -112,7 +124,7 @@ export default function LoginPage() {
   // Dashboard mapping
   // -----------------------------
   const renderDashboard = () => {
-    const props = { user: loggedInUser, onLogout: handleLogout }
+    const props = { user: loggedInUser, token: sessionToken, onLogout: handleLogout }
 
     switch (loggedInUser) {
       case "BillingDesk":
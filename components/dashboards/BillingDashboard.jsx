@@ -2,42 +2,69 @@
 
 import { useState, useEffect } from "react"
 
-export default function BillingDashboard({ user, onLogout, onUpdateStatus }) {
+export default function BillingDashboard({ user, token, onLogout, onUpdateStatus }) {
   const [allPatients, setAllPatients] = useState([])
   const [filter, setFilter] = useState("all")
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
+  const [summary, setSummary] = useState(null)
 
-  const password = "Billing$Vault2025"
+  // Map JSON to front-end keys
+  const toPatient = (record) => ({
+    id: record["Patient_id"] || "",
+    admissionDate: record["Admission_date"] || "",
+    dischargeDate: record["Discharge_date"] || "",
+    wardRoom: record["Room_alloted"] || "",
+    doctorAssigned: record["Doctor_assigned"] || "",
+    treatmentCost: parseFloat(record["Treatment_cost"] || 0),
+    insuranceProvider: record["Insurance_provider"] || "",
+    paymentStatus: record["Payment_status"] || "pending"
+  })
 
-  const fetchBillingData = async () => {
-    setLoading(true)
-    setError(null)
+  // Totals come from the backend's billing store, where only new or changed
+  // records are decrypted; they fill in whenever that sync finishes
+  const fetchSummary = async () => {
     try {
-      const response = await fetch("http://127.0.0.1:8000/api/fetch_billingdesk_data", {
+      const response = await fetch("http://127.0.0.1:8000/api/fetch_billingdesk_summary", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ password })
+        body: JSON.stringify({ token })
       })
+      if (!response.ok) throw new Error("Failed to fetch billing summary")
+      const data = await response.json()
+      setSummary(data.summary)
+    } catch (err) {
+      console.error(err)
+    }
+  }
+
+  const fetchBillingData = async () => {
+    setLoading(true)
+    setError(null)
+    setAllPatients([])
+    try {
+      // Render each page as soon as it arrives instead of waiting for the whole container
+      let continuationToken = null
+      let total = 0
+      do {
+        const response = await fetch("http://127.0.0.1:8000/api/fetch_billingdesk_page", {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({ token, continuationToken })
+        })
 
-      if (!response.ok) throw new Error("Failed to fetch billing data")
+        if (!response.ok) throw new Error("Failed to fetch billing data")
 
-      const data = await response.json()
-      if (!Array.isArray(data) || !data.length) throw new Error("No billing records found")
-
-      // Map JSON to front-end keys
-      const patients = data.map(record => ({
-        id: record["Patient_id"] || "",
-        admissionDate: record["Admission_date"] || "",
-        dischargeDate: record["Discharge_date"] || "",
-        wardRoom: record["Room_alloted"] || "",
-        doctorAssigned: record["Doctor_assigned"] || "",
-        treatmentCost: parseFloat(record["Treatment_cost"] || 0),
-        insuranceProvider: record["Insurance_provider"] || "",
-        paymentStatus: record["Payment_status"] || "pending"
-      }))
-
-      setAllPatients(patients)
+        const data = await response.json()
+        const patients = (data.records || []).map(toPatient)
+        total += patients.length
+        setAllPatients((prev) => [...prev, ...patients])
+        if (total) setLoading(false)
+
+        continuationToken = data.continuationToken
+      } while (continuationToken)
+
+      if (!total) throw new Error("No billing records found")
     } catch (err) {
       console.error(err)
       setError(err.message || "Error fetching billing data")
@@ -47,6 +74,7 @@ export default function BillingDashboard({ user, onLogout, onUpdateStatus }) {
   }
 
   useEffect(() => {
+    fetchSummary()
     fetchBillingData()
   }, [])
 
@@ -99,6 +127,23 @@ export default function BillingDashboard({ user, onLogout, onUpdateStatus }) {
 
         {!loading && !error && (
           <>
+            {summary && (
+              <div className="grid grid-cols-1 sm:grid-cols-3 gap-4 mb-6">
+                <div className="bg-white rounded-lg border border-gray-200 p-4 shadow-sm">
+                  <p className="text-sm text-gray-600">Patients</p>
+                  <p className="text-2xl font-semibold text-gray-900">{summary.count}</p>
+                </div>
+                <div className="bg-white rounded-lg border border-gray-200 p-4 shadow-sm">
+                  <p className="text-sm text-gray-600">Pending Amount</p>
+                  <p className="text-2xl font-semibold text-red-700">₹{summary.pendingAmount.toLocaleString()}</p>
+                </div>
+                <div className="bg-white rounded-lg border border-gray-200 p-4 shadow-sm">
+                  <p className="text-sm text-gray-600">Total Billed</p>
+                  <p className="text-2xl font-semibold text-gray-900">₹{summary.totalAmount.toLocaleString()}</p>
+                </div>
+              </div>
+            )}
+
             <div className="flex gap-4 mb-6 border-b border-gray-200">
               {["all", "pending", "paid"].map((tab) => (
                 <button
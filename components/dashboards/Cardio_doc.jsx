@@ -2,7 +2,7 @@
 
 import { useState } from "react"
 
-export default function DoctorDashboard({ user, onLogout }) {
+export default function DoctorDashboard({ user, token, onLogout }) {
   const [activeTab, setActiveTab] = useState("search")
   const [searchPatientId, setSearchPatientId] = useState("")
   const [selectedPatient, setSelectedPatient] = useState(null)
@@ -11,7 +11,6 @@ export default function DoctorDashboard({ user, onLogout }) {
   const [showEmergencyConfirm, setShowEmergencyConfirm] = useState(false)
   const [gpData, setGpData] = useState(null)
 
-  const password = "Cardio@Heart2025"
   const gpPassword = "GP_Doctor#Secure1"
 
   // Fetch cardiology patient data
@@ -26,7 +25,7 @@ const handleSearch = async (e) => {
     const response = await fetch("http://127.0.0.1:8000/api/fetch_cardio_data", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ patientId: Number(searchPatientId), password })
+      body: JSON.stringify({ patientId: Number(searchPatientId), token })
     })
 
     let data = null
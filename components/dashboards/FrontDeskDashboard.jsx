@@ -2,15 +2,12 @@
 
 import { useState } from "react"
 
-export default function DoctorDashboard({ user, onLogout }) {
+export default function DoctorDashboard({ user, token, onLogout }) {
   const [searchPatientId, setSearchPatientId] = useState("")
   const [selectedPatient, setSelectedPatient] = useState(null)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
 
-  // Front desk password (Layer A)
-  const password = "FrontDesk@2025!"
-
   const handleSearch = async (e) => {
     e.preventDefault()
 
@@ -34,7 +31,7 @@ export default function DoctorDashboard({ user, onLogout }) {
           // ✅ Send Patient ID as STRING (IMPORTANT)
           body: JSON.stringify({
             patientId: searchPatientId,
-            password
+            token
           })
         }
       )
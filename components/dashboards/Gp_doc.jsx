@@ -2,7 +2,7 @@
 
 import { useState } from "react"
 
-export default function DoctorDashboard({ user, onLogout, onEmergencyAccess, emergencyAccess }) {
+export default function DoctorDashboard({ user, token, onLogout, onEmergencyAccess, emergencyAccess }) {
   const [activeTab, setActiveTab] = useState("search")
   const [searchPatientId, setSearchPatientId] = useState("")
   const [selectedPatient, setSelectedPatient] = useState(null)
@@ -10,8 +10,6 @@ export default function DoctorDashboard({ user, onLogout, onEmergencyAccess, eme
   const [error, setError] = useState(null)
   const [showEmergencyConfirm, setShowEmergencyConfirm] = useState(false)
 
-  const password = "GP_Doctor#Secure1"
-
   const handleSearch = async (e) => {
     e.preventDefault()
     setLoading(true)
@@ -22,7 +20,7 @@ export default function DoctorDashboard({ user, onLogout, onEmergencyAccess, eme
       const response = await fetch("http://127.0.0.1:8000/api/fetch_gp_data", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ patientId: Number(searchPatientId), password })
+        body: JSON.stringify({ patientId: Number(searchPatientId), token })
       })
 
       if (!response.ok) throw new Error("Failed to fetch patient data")